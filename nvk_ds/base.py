@@ -105,7 +105,7 @@ class BaseResource(ABC):
         """Build own query instance."""
         
         cls = type(self)
-        q = cls.query_cls().resource(self)
+        q = cls.query_cls().ds(self)
         for name, value in kwargs.items():
             try:
                 fn = getattr(q, name)
@@ -0,0 +1,422 @@
+"""The file based caches."""
+
+import io
+import os
+import gzip
+import json
+import time
+import errno
+import inspect
+import hashlib
+import tempfile
+import threading
+from datetime import date
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .utils import json_serialize, json_loads
+
+
+def write_atomic(path: Path, content: bytes):
+    """Write the file content at once through the temporary file."""
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(content)
+        os.replace(tmp_path, str(path))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def evict_lru(path: Path, max_size: int, pattern: str = "*") -> int:
+    """
+    Remove the least recently used files above the total size limit.
+
+    Returns the total size of the rest files.
+    """
+    files = []
+    total_size = 0
+    for file_path in path.glob(pattern):
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, file_path))
+        total_size += stat.st_size
+    files.sort()
+    for _, size, file_path in files:
+        if total_size <= max_size:
+            break
+        try:
+            file_path.unlink()
+        except FileNotFoundError:
+            pass
+        total_size -= size
+    return total_size
+
+
+class SizeLimit:
+    """
+    The running total size of the cache files.
+
+    The files are listed by ``evict_lru`` only when the total exceeds
+    ``max_size`` or every ``rescan_writes`` writes, as the directory may be
+    shared by the other processes. The eviction frees the room down to the
+    ``evict_ratio`` of ``max_size`` to not list the files on each write.
+    """
+
+    rescan_writes = 1000
+    evict_ratio = 0.9
+
+    def __init__(self, path: Path, max_size: int, pattern: str = "*"):
+        self.path = path
+        self.max_size = max_size
+        self.pattern = pattern
+        self._total_size = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def add(self, size: int):
+        """Count the written file and evict the files above the limit."""
+        with self._lock:
+            self._writes += 1
+            if self._total_size is not None:
+                self._total_size += size
+            if self._total_size is None \
+                    or self._total_size > self.max_size \
+                    or self._writes >= type(self).rescan_writes:
+                self._total_size = evict_lru(
+                    self.path,
+                    int(self.max_size * type(self).evict_ratio),
+                    self.pattern
+                )
+                self._writes = 0
+
+
+class ResponseCache:
+    """
+    The on-disk cache of the decoded HTTP responses.
+
+    The entry keeps the response data with its ``ETag`` and
+    ``Last-Modified`` validators. The entry younger than ``ttl`` seconds is
+    used as is, the older one is revalidated. The least recently used
+    entries are removed above the ``max_size`` bytes.
+    """
+
+    default_ttl = 3600
+    default_max_size = 256 * 1024 * 1024
+
+    def __init__(self, path: str, ttl: int = None, max_size: int = None):
+        cls = type(self)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ttl = cls.default_ttl if ttl is None else ttl
+        self.max_size = max_size or cls.default_max_size
+        self.size_limit = SizeLimit(self.path, self.max_size, "*.json")
+
+    @staticmethod
+    def make_key(url: str, params: Any = None, headers: Any = None) -> str:
+        """Return the entry key of the request."""
+        return hashlib.sha256(json.dumps(
+            [url, params, headers],
+            sort_keys=True,
+            default=str
+        ).encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.path / "{0}.json".format(key)
+
+    def get(self, key: str) -> dict:
+        """Return the entry or ``None``."""
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, "rb") as fh:
+                entry = json.load(fh)
+            os.utime(entry_path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry.get("stored_at", 0) < self.ttl
+
+    @staticmethod
+    def get_validators(entry: dict) -> dict:
+        """Return the conditional request headers of the entry."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def set(
+        self,
+        key: str,
+        data: Any,
+        etag: str = None,
+        last_modified: str = None
+    ) -> dict:
+        """Store the entry and evict the least recently used ones."""
+        entry = dict(
+            stored_at=time.time(),
+            etag=etag,
+            last_modified=last_modified,
+            data=data
+        )
+        content = json.dumps(entry, default=json_serialize).encode("utf-8")
+        write_atomic(self.entry_path(key), content)
+        self.size_limit.add(len(content))
+        return entry
+
+    def refresh(self, key: str, entry: dict) -> dict:
+        """Store the revalidated entry as the new one."""
+        return self.set(
+            key,
+            entry["data"],
+            etag=entry.get("etag"),
+            last_modified=entry.get("last_modified")
+        )
+
+
+def key_serialize(obj: Any) -> Any:
+    """Return the stable JSON value of the cache key argument."""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=repr)
+    if type(obj).__repr__ is object.__repr__:
+        # The default ``<X object at 0x...>`` differs in every process
+        raise TypeError(
+            "The cache key argument of type {0} is not serializable, "
+            "pass it by `ignore` or `key`".format(type(obj).__name__)
+        )
+    return str(obj)
+
+
+class ResultCache:
+    """
+    The on-disk cache of the functions results.
+
+    The entry key is the function name with its arguments normalized by
+    the function signature, so ``f(1)`` and ``f(x=1)`` are the same entry.
+    The ``ignore`` arguments (e.g. the resources or the session) are not
+    the part of the key, the ``key`` function of the call arguments
+    replaces them all.
+    The results are stored as the gzipped JSON lines (``jsonl``) or as
+    the Parquet file (``parquet``, for the Arrow tables and the lists of
+    dicts). The entries older than ``ttl`` seconds are recomputed, the least
+    recently used ones are removed above the ``max_size`` bytes. The entry
+    is computed by the one worker at once, the others wait for the lock
+    and read the stored result.
+    """
+
+    default_ttl = 24 * 3600
+    default_max_size = 1024 * 1024 * 1024
+    formats = {"jsonl": "jsonl.gz", "parquet": "parquet"}
+    lock_timeout = 3600
+    lock_poll_interval = 0.5
+
+    def __init__(
+        self,
+        path: str,
+        ttl: int = None,
+        max_size: int = None,
+        format: str = "jsonl",
+        key: Callable = None,
+        ignore: tuple = ()
+    ):
+        cls = type(self)
+        if format not in cls.formats:
+            raise ValueError("Unknown cache format: {0}".format(format))
+        self.path = Path(path)
+        self.ttl = cls.default_ttl if ttl is None else ttl
+        self.max_size = max_size or cls.default_max_size
+        self.format = format
+        self.key = key
+        self.ignore = frozenset(ignore)
+        self.size_limit = SizeLimit(self.path, self.max_size, "*.result.*")
+
+    def make_key(
+        self,
+        fn: Callable,
+        args: tuple = (),
+        kwargs: dict = None
+    ) -> str:
+        """Return the entry key of the function call."""
+        kwargs = kwargs or {}
+        if self.key is not None:
+            arguments = self.key(*args, **kwargs)
+        else:
+            bound = inspect.signature(fn).bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {
+                name: value for name, value in bound.arguments.items()
+                if name not in self.ignore
+            }
+        return hashlib.sha256(json.dumps(
+            [fn.__module__, fn.__qualname__, arguments],
+            sort_keys=True,
+            default=key_serialize
+        ).encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.path / "{0}.result.{1}".format(
+            key, self.formats[self.format]
+        )
+
+    def lock_path(self, key: str) -> Path:
+        return self.path / "{0}.lock".format(key)
+
+    def dumps(self, result: Any) -> bytes:
+        """Return the file content of the result."""
+        stored_at = str(time.time())
+        if self.format == "parquet":
+            if isinstance(result, pa.Table):
+                kind, table = "table", result
+            else:
+                kind, table = "rows", pa.Table.from_pylist(list(result))
+            table = table.replace_schema_metadata(dict(
+                table.schema.metadata or {},
+                nvk_ds_kind=kind,
+                nvk_ds_stored_at=stored_at
+            ))
+            sink = pa.BufferOutputStream()
+            pq.write_table(table, sink)
+            return sink.getvalue().to_pybytes()
+
+        is_rows = isinstance(result, (list, tuple))
+        stream = io.StringIO()
+        stream.write(json.dumps(dict(
+            kind="rows" if is_rows else "value",
+            stored_at=stored_at
+        )))
+        stream.write("\n")
+        for item in (result if is_rows else [result]):
+            stream.write(json.dumps(item, default=json_serialize))
+            stream.write("\n")
+        return gzip.compress(stream.getvalue().encode("utf-8"))
+
+    def loads(self, path: Path):
+        """Return the stored time and the result of the entry file."""
+        if self.format == "parquet":
+            table = pq.read_table(str(path))
+            metadata = table.schema.metadata or {}
+            stored_at = float(metadata[b"nvk_ds_stored_at"])
+            if metadata.get(b"nvk_ds_kind") == b"rows":
+                return stored_at, table.to_pylist()
+            return stored_at, table
+
+        with gzip.open(str(path), "rb") as fh:
+            header = json_loads(fh.readline())
+            items = [json_loads(line) for line in fh if line.strip()]
+        if header["kind"] == "rows":
+            return float(header["stored_at"]), items
+        return float(header["stored_at"]), items[0]
+
+    def get(self, key: str):
+        """Return the fresh entry as the ``(True, result)`` pair."""
+        entry_path = self.entry_path(key)
+        try:
+            stored_at, result = self.loads(entry_path)
+        except (OSError, KeyError, IndexError, ValueError, pa.ArrowException):
+            return False, None
+        if time.time() - stored_at >= self.ttl:
+            return False, None
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            pass
+        return True, result
+
+    def set(self, key: str, result: Any):
+        """Store the result and evict the least recently used entries."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        content = self.dumps(result)
+        write_atomic(self.entry_path(key), content)
+        self.size_limit.add(len(content))
+
+    def acquire(self, key: str) -> bool:
+        """Create the lock file of the entry, remove the stale one."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        lock_path = self.lock_path(key)
+        try:
+            fd = os.open(
+                str(lock_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY
+            )
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+            try:
+                age = time.time() - lock_path.stat().st_mtime
+            except FileNotFoundError:
+                return False
+            if age > self.lock_timeout:
+                try:
+                    lock_path.unlink()
+                except FileNotFoundError:
+                    pass
+            return False
+        with os.fdopen(fd, "w") as fh:
+            fh.write(str(os.getpid()))
+        return True
+
+    def release(self, key: str):
+        try:
+            self.lock_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Return the cached result of the call or call the function."""
+        key = self.make_key(fn, args, kwargs)
+        while True:
+            found, result = self.get(key)
+            if found:
+                return result
+            if self.acquire(key):
+                break
+            time.sleep(self.lock_poll_interval)
+        try:
+            # The other worker could store the result before the lock
+            found, result = self.get(key)
+            if found:
+                return result
+            result = fn(*args, **kwargs)
+            self.set(key, result)
+            return result
+        finally:
+            self.release(key)
+
+
+def cached(
+    path: str,
+    ttl: int = None,
+    max_size: int = None,
+    format: str = "jsonl",
+    key: Callable = None,
+    ignore: tuple = ()
+):
+    """The function results cache decorator, see ``ResultCache``."""
+    cache = ResultCache(
+        path,
+        ttl=ttl,
+        max_size=max_size,
+        format=format,
+        key=key,
+        ignore=ignore
+    )
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            return cache.call(fn, *args, **kwargs)
+        wrapped.cache = cache
+        return wrapped
+    return decorator
@@ -1,9 +1,194 @@
 """The files data resource classes."""
 
 from pathlib import Path
+import io
+import copy
 import json
+import gzip
+import codecs
+import hashlib
+import collections
+
+import pyarrow as pa
+import pyarrow.dataset as pads
+from pyarrow import fs as pafs
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from .base import BaseResource, BaseQuery
+from .cache import write_atomic
+from .utils import json_loads
+
+
+# The files suffixes of the formats and compressions.
+FORMAT_SUFFIXES = {
+    "json": (".json",),
+    "ndjson": (".ndjson", ".jsonl"),
+    "parquet": (".parquet", ".pq"),
+    "csv": (".csv",),
+    "arrow": (".arrow", ".ipc", ".feather"),
+}
+
+# The formats read as the ``pyarrow`` datasets.
+DATASET_FORMATS = {
+    "parquet": "parquet",
+    "csv": "csv",
+    "arrow": "ipc",
+}
+
+FILTER_OPERATORS = {
+    "=": lambda field, value: field == value,
+    "==": lambda field, value: field == value,
+    "!=": lambda field, value: field != value,
+    "<": lambda field, value: field < value,
+    "<=": lambda field, value: field <= value,
+    ">": lambda field, value: field > value,
+    ">=": lambda field, value: field >= value,
+    "in": lambda field, value: field.isin(value),
+    "not in": lambda field, value: ~field.isin(value),
+}
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+}
+
+# The bytes count read at once by the streaming readers.
+CHUNK_SIZE = 1024 * 1024
+
+
+def get_compression(path: Path) -> str:
+    """Return the file compression by its suffix."""
+    return COMPRESSION_SUFFIXES.get(path.suffix.lower())
+
+
+def get_format_suffix(path: Path) -> str:
+    """Return the file suffix without the compression one."""
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if suffixes and suffixes[-1] in COMPRESSION_SUFFIXES:
+        suffixes.pop()
+    return suffixes[-1] if suffixes else ""
+
+
+def to_expression(filters):
+    """
+    Return the dataset filter expression.
+
+    The filters are the expression itself, the list of the
+    ``(column, operator, value)`` conditions joined by ``AND`` or the list
+    of such lists joined by ``OR``.
+    """
+    if filters is None or isinstance(filters, pads.Expression):
+        return filters
+    if filters and all(isinstance(item, list) for item in filters):
+        expression = None
+        for conjunction in filters:
+            condition = to_expression(conjunction)
+            expression = condition if expression is None \
+                else expression | condition
+        return expression
+    expression = None
+    for column, operator, value in filters:
+        try:
+            condition = FILTER_OPERATORS[operator.lower()](
+                pads.field(column), value
+            )
+        except KeyError:
+            raise ValueError("Unknown filter operator: {0}".format(operator))
+        expression = condition if expression is None \
+            else expression & condition
+    return expression
+
+
+def open_file(path: Path, compression: str = None):
+    """Open the (maybe compressed) file for the binary reading."""
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("The `zstandard` doesn't installed")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb")),
+            CHUNK_SIZE
+        )
+    return open(path, "rb")
+
+
+def iter_json_array(fh, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield the items of the top level JSON array one by one.
+
+    The file is read by chunks and each item is decoded as soon as it is
+    complete, so only the current item is kept in memory. The document
+    which is not an array yields nothing.
+    """
+    if ijson is not None and hasattr(fh, "peek"):
+        head = fh.peek(64).lstrip()[:1]
+        if head == b"[":
+            yield from ijson.items(fh, "item", use_float=True)
+            return
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def read_more():
+        nonlocal buf, pos, eof
+        chunk = fh.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                return
+            read_more()
+            continue
+        char = buf[pos]
+        if not started:
+            if char != "[":
+                return
+            started = True
+            pos += 1
+        elif char == "]":
+            return
+        elif char == ",":
+            pos += 1
+        else:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            if not eof and (end == len(buf) or buf[end] not in ",] \t\r\n"):
+                # The item is complete only when followed by the delimiter,
+                # e.g. the number cut at ``.`` or ``e`` is decoded as well.
+                read_more()
+                continue
+            yield item
+            pos = end
+
+
+def iter_ndjson(fh):
+    """Yield the items of the newline delimited JSON file."""
+    for line in fh:
+        if line.strip():
+            yield json_loads(line)
 
 
 class FSQuery(BaseQuery):
@@ -11,47 +196,274 @@ class FSQuery(BaseQuery):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._x__format = "json"
+        # The files compression (``gzip``, ``zstd``), by suffix if not set.
+        self._x__compression = None
+        # Read the files on iteration, item by item.
+        self._x__stream = False
+        # The columns and the rows filter of the ``parquet``, ``csv`` and
+        # ``arrow`` formats, the filter is pushed down to the row groups.
+        self._x__columns = None
+        self._x__filter = None
         self._result = []
+        self._files = None
 
     def _clone(self):
         c = super()._clone()
         c._x__format = self._x__format
+        c._x__compression = self._x__compression
+        c._x__stream = self._x__stream
+        c._x__columns = copy.copy(self._x__columns)
+        c._x__filter = copy.copy(self._x__filter)
         return c
 
-    def execute(self):
+    def find_files(self) -> list:
+        """
+        Return the resource files of the query format.
+
+        The incremental resource returns only the new and changed files.
+        """
         ds_path = Path(self._x__ds._config)
+        manifest_path = self._x__ds.manifest_path \
+            if self._x__ds.incremental else None
+        suffixes = FORMAT_SUFFIXES.get(
+            self._x__format, (".{0}".format(self._x__format),)
+        )
         ds_files = []
         if ds_path.is_dir():
-            for path_object in ds_path.glob("**/*"):
-                if (path_object.is_file() 
-                        and path_object.suffix == self._x__format):
+            for path_object in sorted(ds_path.glob("**/*")):
+                if (path_object.is_file()
+                        and path_object != manifest_path
+                        and get_format_suffix(path_object) in suffixes):
                     ds_files.append(path_object)
         elif ds_path.is_file():
             ds_files.append(ds_path)
+        if self._x__ds.incremental:
+            ds_files = [
+                ds_file for ds_file in ds_files
+                if self._x__ds.check_file(ds_file)
+            ]
+        return ds_files
+
+    def get_files(self) -> list:
+        if self._files is None:
+            self._files = self.find_files()
+        return self._files
+
+    def iter_file(self, ds_file: Path):
+        """Yield the file items, the file is marked read at the end."""
+        compression = self._x__compression or get_compression(ds_file)
+        rows = 0
+        with open_file(ds_file.resolve(), compression) as fh:
+            if self._x__format == "ndjson":
+                items = iter_ndjson(fh)
+            elif self._x__format == "json":
+                items = iter_json_array(fh)
+            else:
+                items = ()
+            for item in items:
+                rows += 1
+                yield item
+        self._x__ds.mark_read(ds_file, rows)
+
+    def get_scanner(self) -> pads.Scanner:
+        """
+        Return the scanner of the query files, IPC ones memory-mapped.
+
+        The incremental resource files are not scanned with the columns or
+        the filter: such files could never be marked read, see
+        ``iter_record_batches``.
+        """
+        if self._x__ds.incremental and (
+                self._x__filter is not None or self._x__columns is not None):
+            raise ValueError(
+                "The incremental resource can't be scanned with the columns "
+                "or the filter"
+            )
+        dataset_format = DATASET_FORMATS[self._x__format]
+        return pads.dataset(
+            [str(ds_file.resolve()) for ds_file in self.get_files()],
+            format=dataset_format,
+            filesystem=pafs.LocalFileSystem(use_mmap=True)
+            if dataset_format == "ipc" else None
+        ).scanner(
+            columns=self._x__columns,
+            filter=to_expression(self._x__filter),
+            use_threads=True
+        )
+
+    def iter_record_batches(self, scanner: pads.Scanner = None):
+        """
+        Yield the record batches scanned by the threads pool.
 
-        if self._x__format == "json":
-            for ds_file in ds_files:
-                with open(ds_file.resolve(), "r") as fh:
-                    data = json.load(fh)
-                    if isinstance(data, list):
-                        for item in data:
-                            self._result.append(item)
+        The files are marked read once all the batches are consumed, but
+        the filtered or projected ones as the rest of their data is not
+        (the incremental resource does not scan them at all).
+        """
+        scanner = scanner or self.get_scanner()
+        rows = collections.Counter()
+        for tagged_batch in scanner.scan_batches():
+            rows[tagged_batch.fragment.path] += \
+                tagged_batch.record_batch.num_rows
+            yield tagged_batch.record_batch
+        if self._x__filter is not None or self._x__columns is not None:
+            return
+        for ds_file in self.get_files():
+            self._x__ds.mark_read(ds_file, rows[str(ds_file.resolve())])
+
+    def to_arrow(self) -> pa.Table:
+        """Return the query files data as the Arrow table."""
+        scanner = self.get_scanner()
+        return pa.Table.from_batches(
+            list(self.iter_record_batches(scanner)),
+            schema=scanner.projected_schema
+        )
+
+    def iter_items(self):
+        """Yield the items of all the files."""
+        if self._x__format in DATASET_FORMATS:
+            for batch in self.iter_record_batches():
+                yield from batch.to_pylist()
+            return
+        for ds_file in self.get_files():
+            yield from self.iter_file(ds_file)
+
+    def execute(self):
+        self._files = self.find_files()
+        if not self._x__stream:
+            self._result.extend(self.iter_items())
         return self
 
     def __iter__(self):
+        if self._x__stream:
+            return self.iter_items()
         return (item for item in self._result)
 
     def to_dict(self):
         return dict(
-            path=self._x__path,
+            path=self._x__ds._config if self._x__ds else None,
             format=self._x__format
         )
 
 
 class FSResource(BaseResource):
+    """
+    The files resource.
+
+    The ``incremental`` resource keeps the manifest of the files read
+    (size, mtime, content hash, rows count) at ``manifest_path``, next to
+    the data by default. Its queries return only the new and changed
+    files, the manifest is updated by ``commit`` once the data is consumed.
+    Nothing commits it implicitly: the caller commits or the consuming
+    task gets the ``tasks.commit_on_success`` state handler (or the
+    ``DataQueryTask`` is created with ``commit_resource=True``), otherwise
+    the files are read again by the next run.
+    """
+
+    manifest_name = ".nvk_ds_manifest.json"
 
     query_cls = FSQuery
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._manifest = None
+        # The files checked and read since the last commit.
+        self._checked = {}
+        self._pending = {}
+
+    @property
+    def incremental(self) -> bool:
+        return bool(self._kwargs.get("incremental", False))
+
+    @property
+    def manifest_path(self) -> Path:
+        cls = type(self)
+        manifest_path = self._kwargs.get("manifest_path")
+        if manifest_path:
+            return Path(manifest_path)
+        ds_path = Path(self._config)
+        if ds_path.is_dir():
+            return ds_path / cls.manifest_name
+        return ds_path.with_name(ds_path.name + ".manifest.json")
+
+    def load_manifest(self) -> dict:
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, "r") as fh:
+                    self._manifest = json.load(fh)
+            except FileNotFoundError:
+                self._manifest = {}
+        return self._manifest
+
+    def file_key(self, ds_file: Path) -> str:
+        """Return the file path relative to the resource directory."""
+        ds_path = Path(self._config).resolve()
+        ds_file = ds_file.resolve()
+        try:
+            return str(ds_file.relative_to(ds_path))
+        except ValueError:
+            return str(ds_file)
+
+    @staticmethod
+    def file_hash(ds_file: Path) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(ds_file, "rb") as fh:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def check_file(self, ds_file: Path) -> bool:
+        """
+        Return whether or not the file is new or changed.
+
+        The content hash is computed only when the size or mtime differ.
+        """
+        key = self.file_key(ds_file)
+        stat = ds_file.stat()
+        info = dict(size=stat.st_size, mtime=stat.st_mtime_ns)
+        entry = self.load_manifest().get(key)
+        if entry and entry["size"] == info["size"] \
+                and entry["mtime"] == info["mtime"]:
+            return False
+        info["hash"] = type(self).file_hash(ds_file)
+        if entry and entry["hash"] == info["hash"]:
+            # The touched file has the same content.
+            self._pending[key] = dict(entry, **info)
+            return False
+        self._checked[key] = info
+        return True
+
+    def mark_read(self, ds_file: Path, rows: int):
+        """Add the read file into the manifest pending for the commit."""
+        if not self.incremental:
+            return
+        key = self.file_key(ds_file)
+        info = self._checked.pop(key, None)
+        if info is None:
+            stat = ds_file.stat()
+            info = dict(
+                size=stat.st_size,
+                mtime=stat.st_mtime_ns,
+                hash=type(self).file_hash(ds_file)
+            )
+        self._pending[key] = dict(info, rows=rows)
+
+    def commit(self):
+        """Write the manifest with the files read at once."""
+        if not self._pending:
+            return
+        manifest = dict(self.load_manifest(), **self._pending)
+        write_atomic(
+            self.manifest_path,
+            json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+        )
+        self._manifest = manifest
+        self._pending = {}
+
+    def rollback(self):
+        """Forget the files read since the last commit."""
+        self._checked = {}
+        self._pending = {}
+
     def open(self):
         pass
 
@@ -1,24 +1,41 @@
 """The `GBQ` data resource classes."""
 
 import copy
+import json
 import uuid
+import itertools
+import tempfile
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 from google.api_core.exceptions import BadRequest
 from google.oauth2 import service_account
 
+try:
+    from google.cloud import bigquery_storage
+except ImportError:
+    bigquery_storage = None
+
 from .base import BaseResource, BaseQuery
-from .utils import to_stream_gqb
+from .utils import to_stream_gqb, json_serialize
 
 
 class GBQQuery(BaseQuery):
+
+    # The rows count fetched per result page.
+    default_page_size = 10000
     
     def __init__(self):
+        cls = type(self)
         super().__init__()
         self._x__table_name = ''
         self._x__query = None
         self._x__params = []
+        # Fetch the result pages lazily on iteration.
+        self._x__stream = False
+        self._x__page_size = cls.default_page_size
         self._result = None
         self._job = None
 
@@ -27,9 +44,20 @@ class GBQQuery(BaseQuery):
         c._x__table_name = self._x__table_name
         c._x__query = self._x__query
         c._x__params = copy.copy(self._x__params)
+        c._x__stream = self._x__stream
+        c._x__page_size = self._x__page_size
         return c
 
     def execute(self):
+        self.run_job()
+        if self._x__stream:
+            self._result = None
+        else:
+            self._result = [dict(row.items()) for row in self._job]
+        return self
+
+    def run_job(self):
+        """Start the query job."""
         if not self._x__ds.opened:
             self._x__ds.open()
         query_kwargs = {}
@@ -43,10 +71,46 @@ class GBQQuery(BaseQuery):
             query_sql, 
             **query_kwargs    
         )
-        self._result = [dict(row.items()) for row in self._job]
-        return self
+        return self._job
+
+    def iter_rows(self):
+        """Yield the result rows fetching the pages one by one."""
+        for row in self._job.result(page_size=self._x__page_size):
+            yield dict(row.items())
+
+    def iter_record_batches(self):
+        """
+        Yield the result as the Arrow record batches.
+
+        The result is read by the BigQuery Storage API client of the
+        resource if any, otherwise page by page by the REST API.
+        """
+        if self._job is None:
+            self.run_job()
+        rows = self._job.result(page_size=self._x__page_size)
+        bqstorage_client = self._x__ds.get_bqstorage_client()
+        if hasattr(rows, 'to_arrow_iterable'):
+            yield from rows.to_arrow_iterable(
+                bqstorage_client=bqstorage_client
+            )
+        else:
+            yield from rows.to_arrow(
+                bqstorage_client=bqstorage_client,
+                create_bqstorage_client=False
+            ).to_batches()
+
+    def to_arrow(self):
+        """Return the result as the Arrow table."""
+        if self._job is None:
+            self.run_job()
+        return self._job.result(page_size=self._x__page_size).to_arrow(
+            bqstorage_client=self._x__ds.get_bqstorage_client(),
+            create_bqstorage_client=False
+        )
 
     def __iter__(self):
+        if self._result is None and self._job is not None:
+            return self.iter_rows()
         return (item for item in self._result)
 
     def to_dict(self):
@@ -60,9 +124,25 @@ class GBQQuery(BaseQuery):
 class GBQResource(BaseResource):
 
     timeout = 60
+    # The chunked ``bulk_insert`` defaults: the chunk is kept in memory up to
+    # ``spool_size`` bytes and then moved to the temporary file.
+    spool_size = 64 * 1024 * 1024
+    chunk_rows = 500000
+    max_workers = 4
+    # The seconds the truncating load staging table lives at most.
+    staging_expiration = 6 * 3600
     query_cls = GBQQuery
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bqstorage_client = None
+
     def open(self):
+        # The prebuilt (e.g. fake) client could be passed as ``client``.
+        client = self._kwargs.get('client')
+        if client is not None:
+            self._resource = client
+            return
         credentials = service_account.Credentials\
             .from_service_account_info(self._config)
         self._resource = bigquery.Client(
@@ -70,6 +150,28 @@ class GBQResource(BaseResource):
             credentials=credentials
         )
 
+    def get_bqstorage_client(self):
+        """
+        Return the BigQuery Storage API client.
+
+        The client is passed as ``bqstorage_client`` or built when the
+        resource is created with ``bqstorage=True``.
+        """
+        client = self._kwargs.get('bqstorage_client')
+        if client is not None:
+            return client
+        if self._bqstorage_client is None and self._kwargs.get('bqstorage'):
+            if bigquery_storage is None:
+                raise ImportError(
+                    "The `google-cloud-bigquery-storage` doesn't installed"
+                )
+            credentials = service_account.Credentials\
+                .from_service_account_info(self._config)
+            self._bqstorage_client = bigquery_storage.BigQueryReadClient(
+                credentials=credentials
+            )
+        return self._bqstorage_client
+
     def close(self):
         pass
 
@@ -81,6 +183,14 @@ class GBQResource(BaseResource):
         source_format: str = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
         **kwargs
     ):
+        """
+        Load the mappings into the table.
+
+        With the ``chunk_size`` the mappings are loaded by the chunks, see
+        ``bulk_insert_chunked``: the ``NEWLINE_DELIMITED_JSON`` chunks are
+        cut by ``chunk_size`` bytes, the ``PARQUET`` ones by the
+        ``chunk_rows`` rows of the resource.
+        """
         cls = type(self)
         if not self.opened:
             self.open()
@@ -90,6 +200,24 @@ class GBQResource(BaseResource):
             source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
         schema = kwargs.get('schema')
         config_params = {'schema': schema} if schema else {'autodetect': True}
+
+        if kwargs.get('chunk_size'):
+            return self.bulk_insert_chunked(
+                mapper,
+                self.iter_chunks(
+                    mappings,
+                    source_format,
+                    kwargs['chunk_size'],
+                    columns=schema or [],
+                    parquet_schema=parquet_schema
+                ),
+                truncate=truncate,
+                source_format=source_format,
+                timeout=kwargs.get('timeout'),
+                max_workers=kwargs.get('max_workers', cls.max_workers),
+                **config_params
+            )
+
         data_stream = to_stream_gqb(
             mappings, 
             source_format=source_format,
@@ -108,8 +236,206 @@ class GBQResource(BaseResource):
             job_config=job_config
         )
         try:
-            job.result(timeout=cls.timeout)
+            job.result(timeout=kwargs.get('timeout', cls.timeout))
         except BadRequest:
             raise
         else:
             return job.output_rows
+
+    def iter_chunks(
+        self,
+        mappings,
+        source_format: str,
+        chunk_size: int,
+        columns=None,
+        parquet_schema=None
+    ):
+        """
+        Yield the spooled files of the serialized mappings chunks.
+
+        The ``NEWLINE_DELIMITED_JSON`` chunk is closed when it exceeds the
+        ``chunk_size`` bytes. The ``PARQUET`` one holds the ``chunk_rows``
+        rows (the resource setting) whatever the ``chunk_size`` is, as the
+        encoded size is known only once the file is written. At least one
+        (maybe empty) chunk is yielded.
+        """
+        cls = type(self)
+        items = iter(mappings)
+        spool_size = self._kwargs.get('spool_size', cls.spool_size)
+        empty = True
+        if source_format == bigquery.SourceFormat.PARQUET:
+            chunk_rows = self._kwargs.get('chunk_rows', cls.chunk_rows)
+            while True:
+                chunk = list(itertools.islice(items, chunk_rows))
+                if not chunk and not empty:
+                    break
+                empty = False
+                yield to_stream_gqb(
+                    chunk,
+                    source_format=source_format,
+                    columns=columns,
+                    parquet_schema=parquet_schema,
+                    sink=tempfile.SpooledTemporaryFile(max_size=spool_size)
+                )
+                if not chunk:
+                    break
+            return
+
+        stream = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        for item in items:
+            stream.write(
+                json.dumps(item, default=json_serialize).encode('utf-8')
+            )
+            stream.write(b'\n')
+            if stream.tell() >= chunk_size:
+                stream.seek(0)
+                yield stream
+                empty = False
+                stream = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        if stream.tell() or empty:
+            stream.seek(0)
+            yield stream
+        else:
+            stream.close()
+
+    def load_chunk(self, stream, mapper, job_config, timeout=None) -> int:
+        """Load the chunk and return the loaded rows count."""
+        try:
+            job = self._resource.load_table_from_file(
+                stream,
+                mapper,
+                job_config=job_config
+            )
+            job.result(timeout=timeout)
+        finally:
+            stream.close()
+        return job.output_rows
+
+    def get_table_reference(self, mapper) -> bigquery.TableReference:
+        """Return the reference of the table, its reference or ID."""
+        if isinstance(mapper, bigquery.Table):
+            return mapper.reference
+        if isinstance(mapper, bigquery.TableReference):
+            return mapper
+        return bigquery.TableReference.from_string(
+            mapper, default_project=self._resource.project
+        )
+
+    def bulk_insert_chunked(
+        self,
+        mapper,
+        chunks,
+        truncate: bool = False,
+        source_format: str = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        timeout=None,
+        max_workers: int = None,
+        **config_params
+    ) -> int:
+        """
+        Load the chunks by the concurrent load jobs.
+
+        The chunks are loaded into the staging table which is copied into
+        the table by the single ``WRITE_TRUNCATE`` or ``WRITE_APPEND`` job,
+        so the failed chunk leaves the table intact. The staging table keeps
+        the table schema, partitioning and clustering, the missing table is
+        created by the copy with the schema of the loaded chunks.
+        """
+        cls = type(self)
+        table_ref = self.get_table_reference(mapper)
+        staging = bigquery.TableReference(
+            bigquery.DatasetReference(table_ref.project, table_ref.dataset_id),
+            '{0}_nvk_ds_staging_{1}'.format(
+                table_ref.table_id, uuid.uuid4().hex
+            )
+        )
+        # The staging table of the killed worker is dropped by BigQuery
+        expires = datetime.now(timezone.utc) \
+            + timedelta(seconds=cls.staging_expiration)
+        try:
+            target = self._resource.get_table(table_ref)
+        except NotFound:
+            target = None
+        if target is not None:
+            table = bigquery.Table(staging, schema=target.schema)
+            table.time_partitioning = target.time_partitioning
+            table.range_partitioning = target.range_partitioning
+            table.clustering_fields = target.clustering_fields
+            table.expires = expires
+            self._resource.create_table(table)
+
+        try:
+            output_rows = self.load_chunks(
+                staging, chunks, source_format, timeout, max_workers,
+                **config_params
+            )
+            if target is None:
+                # The first chunk has created the staging table, if any
+                try:
+                    table = self._resource.get_table(staging)
+                except NotFound:
+                    return output_rows
+                table.expires = expires
+                self._resource.update_table(table, ['expires'])
+            job = self._resource.copy_table(
+                staging,
+                table_ref,
+                job_config=bigquery.CopyJobConfig(
+                    write_disposition='WRITE_TRUNCATE' if truncate
+                    else 'WRITE_APPEND'
+                )
+            )
+            job.result(timeout=timeout)
+        finally:
+            self._resource.delete_table(staging, not_found_ok=True)
+        return output_rows
+
+    def load_chunks(
+        self,
+        mapper,
+        chunks,
+        source_format: str,
+        timeout=None,
+        max_workers: int = None,
+        **config_params
+    ) -> int:
+        """
+        Append the chunks to the table by the concurrent load jobs.
+
+        The first chunk is loaded alone as it may create the table, then
+        up to ``max_workers`` chunks are being loaded at the same time. The
+        chunks loaded before the failed one are kept, see
+        ``bulk_insert_chunked``.
+        """
+        cls = type(self)
+        max_workers = max_workers or cls.max_workers
+        job_config = bigquery.LoadJobConfig(
+            source_format=source_format,
+            write_disposition='WRITE_APPEND',
+            **config_params
+        )
+
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            return 0
+        output_rows = self.load_chunk(first, mapper, job_config, timeout)
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                for stream in chunks:
+                    if len(pending) >= max_workers:
+                        done, pending = wait(
+                            pending, return_when=FIRST_COMPLETED
+                        )
+                        output_rows += sum(future.result() for future in done)
+                    pending.add(executor.submit(
+                        self.load_chunk, stream, mapper, job_config, timeout
+                    ))
+                for future in pending:
+                    output_rows += future.result()
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                raise
+        return output_rows
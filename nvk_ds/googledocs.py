@@ -1,9 +1,147 @@
 """The `Googledocs` dataresource classes."""
 
+import re
+import copy
+import json
+import itertools
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
 from google.oauth2 import service_account
 from apiclient import discovery
 
 from .base import BaseResource, BaseQuery
+from .utils import json_serialize
+from .validators import NUMBER_SPACES_RE, DatetimeParser
+
+
+# The ``A1:B2`` like cells range.
+A1_CELLS_RE = re.compile(
+    r"^(?P<start_col>[A-Za-z]{0,3})(?P<start_row>\d*)"
+    r"(?::(?P<end_col>[A-Za-z]{0,3})(?P<end_row>\d*))?$"
+)
+
+
+def split_a1_range(a1_range: str) -> dict:
+    """
+    Return the range parts: the sheet, the columns and the rows.
+
+    The range without ``!`` which is not a cells range is the sheet title.
+    """
+    sheet, sep, cells = a1_range.rpartition("!")
+    if not sep:
+        sheet, cells = "", a1_range
+    match = A1_CELLS_RE.match(cells)
+    if not match or not (match.group("start_col") or match.group("start_row")):
+        return dict(sheet=a1_range if not sep else sheet, start_col="",
+                    start_row=None, end_col="", end_row=None)
+    start_row, end_row = match.group("start_row"), match.group("end_row")
+    if match.group("end_col") is None:
+        end_col, end_row = match.group("start_col"), start_row
+    else:
+        end_col = match.group("end_col")
+    return dict(
+        sheet=sheet,
+        start_col=match.group("start_col"),
+        start_row=int(start_row) if start_row else None,
+        end_col=end_col,
+        end_row=int(end_row) if end_row else None
+    )
+
+
+def block_range(parts: dict, start_row: int, end_row: int) -> str:
+    """Return the A1 range of the rows block."""
+    block = "{0}{1}:{2}{3}".format(
+        parts["start_col"], start_row, parts["end_col"], end_row
+    )
+    return "{0}!{1}".format(parts["sheet"], block) \
+        if parts["sheet"] else block
+
+
+def to_arrow_column(values, type_=None) -> pa.Array:
+    """
+    Return the typed Arrow array of the cells strings.
+
+    The type is the Arrow data type or one of ``str``, ``int``, ``float``,
+    ``bool``, ``datetime`` (the format is inferred, ``datetime:<format>``
+    for the custom format), the conversion is done by the Arrow compute
+    kernels. The blank cells become nulls.
+    """
+    array = pa.array(
+        [None if value is None else str(value) for value in values]
+        if not isinstance(values, pa.Array) else values,
+        type=pa.string()
+    )
+    array = pc.if_else(
+        pc.equal(pc.utf8_trim_whitespace(array), ""),
+        pa.scalar(None, pa.string()),
+        array
+    )
+    if type_ is None or type_ == "str":
+        return array
+    if isinstance(type_, pa.DataType):
+        return pc.cast(array, type_)
+    if type_ == "int":
+        return pc.cast(
+            pc.replace_substring_regex(array, NUMBER_SPACES_RE, ""),
+            pa.int64()
+        )
+    if type_ == "float":
+        return pc.cast(
+            pc.replace_substring(
+                pc.replace_substring_regex(array, NUMBER_SPACES_RE, ""),
+                ",", "."
+            ),
+            pa.float64()
+        )
+    if type_ == "bool":
+        return pc.equal(pc.utf8_lower(array), "true")
+    if type_.startswith("datetime"):
+        _, _, datetime_format = type_.partition(":")
+        if datetime_format:
+            return pc.strptime(array, format=datetime_format, unit="s")
+        values, mask = DatetimeParser(unit="s").parse_array(array)
+        if not pc.all(pc.fill_null(mask, True)).as_py():
+            raise ValueError("Invalid datetime values")
+        return values
+    raise ValueError("Unknown column type: {0}".format(type_))
+
+
+def to_cell_value(value):
+    """Return the value as the sheet cell value."""
+    if value is None:
+        return ""
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, default=json_serialize)
+    try:
+        return json_serialize(value)
+    except TypeError:
+        return str(value)
+
+
+def values_to_table(rows: list, types: dict = None, header: bool = True):
+    """
+    Return the Arrow table of the sheet values.
+
+    The first row is the header unless ``header`` is ``False``, then
+    the columns are named by the positions.
+    """
+    types = types or {}
+    if header and rows:
+        names, rows = [str(name) for name in rows[0]], rows[1:]
+    else:
+        names = [str(idx) for idx in range(max(map(len, rows), default=0))]
+    # The rows are transposed at once, the trailing blank cells are absent.
+    columns = list(itertools.zip_longest(*rows))[:len(names)]
+    columns += [(None,) * len(rows)] * (len(names) - len(columns))
+    return pa.Table.from_arrays(
+        [to_arrow_column(column, types.get(name))
+         for name, column in zip(names, columns)],
+        names=names
+    )
 
 
 class GoogleSheetQuery(BaseQuery):
@@ -12,30 +150,171 @@ class GoogleSheetQuery(BaseQuery):
         super().__init__()
         self._x__spreadsheet_id = ''
         self._x__range = None
+        # Read the multiple ranges by the single ``batchGet`` request.
+        self._x__ranges = None
+        # Read the ranges by the blocks of rows.
+        self._x__block_rows = 0
+        # The ``to_arrow`` header row sign and the columns types.
+        self._x__header = True
+        self._x__types = {}
         self._result = None
+        self._values = None
 
     def _clone(self):
         c = super()._clone()
         c._x__spreadsheet_id = self._x__spreadsheet_id
         c._x__range = self._x__range
+        c._x__ranges = copy.copy(self._x__ranges)
+        c._x__block_rows = self._x__block_rows
+        c._x__header = self._x__header
+        c._x__types = copy.copy(self._x__types)
         return c
 
     def to_dict(self):
         return dict(
             spreadsheet_id=self._x__spreadsheet_id,
-            range=self._x__range
+            range=self._x__range,
+            ranges=self._x__ranges
         )
 
+    def batch_get(self, ranges: list) -> list:
+        """Return the values of the ranges by the single request."""
+        if not ranges:
+            return []
+        response = self._x__ds._resource.spreadsheets().values().batchGet(
+            spreadsheetId=self._x__spreadsheet_id,
+            ranges=ranges
+        ).execute(num_retries=self._x__ds.num_retries)
+        return [
+            value_range.get('values', [])
+            for value_range in response.get('valueRanges', [])
+        ]
+
+    def get_row_counts(self) -> dict:
+        """
+        Return the rows numbers of the sheets by their titles.
+
+        The ``""`` title is the first sheet, it is read by the ranges
+        without the sheet title.
+        """
+        response = self._x__ds._resource.spreadsheets().get(
+            spreadsheetId=self._x__spreadsheet_id,
+            fields="sheets.properties(title,gridProperties.rowCount)"
+        ).execute(num_retries=self._x__ds.num_retries)
+        row_counts = {}
+        for idx, sheet in enumerate(response.get("sheets", [])):
+            properties = sheet.get("properties", {})
+            row_count = properties.get("gridProperties", {}).get("rowCount")
+            row_counts[properties.get("title")] = row_count
+            if idx == 0:
+                row_counts[""] = row_count
+        return row_counts
+
+    def fetch_ranges(self, ranges: list) -> dict:
+        """
+        Return the values of the ranges.
+
+        The ranges are read by the ``block_rows`` rows blocks up to the
+        sheet rows number: each request takes the next block of every
+        unfinished range. The API drops the trailing blank rows of the
+        block, so the blocks are padded by the empty rows to keep the rows
+        positions. The range of the unknown sheet is finished by the empty
+        block.
+        """
+        if not self._x__block_rows:
+            return dict(zip(ranges, self.batch_get(ranges)))
+
+        block_rows = self._x__block_rows
+        row_counts = self.get_row_counts()
+        values = {a1_range: [] for a1_range in ranges}
+        parts = {a1_range: split_a1_range(a1_range) for a1_range in ranges}
+        offsets = {
+            a1_range: parts[a1_range]["start_row"] or 1
+            for a1_range in ranges
+        }
+        bounds = {}
+        for a1_range in ranges:
+            sheet = parts[a1_range]["sheet"]
+            if len(sheet) > 1 and sheet[0] == sheet[-1] == "'":
+                sheet = sheet[1:-1].replace("''", "'")
+            end_row = parts[a1_range]["end_row"]
+            row_count = row_counts.get(sheet)
+            if row_count:
+                end_row = min(end_row, row_count) if end_row else row_count
+            bounds[a1_range] = end_row
+
+        active = [
+            a1_range for a1_range in ranges
+            if not bounds[a1_range] or offsets[a1_range] <= bounds[a1_range]
+        ]
+        while active:
+            blocks = []
+            for a1_range in active:
+                end_row = offsets[a1_range] + block_rows - 1
+                if bounds[a1_range]:
+                    end_row = min(end_row, bounds[a1_range])
+                blocks.append((offsets[a1_range], end_row))
+            next_active = []
+            for a1_range, (start_row, end_row), block in zip(
+                active,
+                blocks,
+                self.batch_get([
+                    block_range(parts[a1_range], start_row, end_row)
+                    for a1_range, (start_row, end_row) in zip(active, blocks)
+                ])
+            ):
+                end_bound = bounds[a1_range]
+                if not block and not end_bound:
+                    continue
+                values[a1_range].extend(block)
+                values[a1_range].extend(
+                    [[]] * (end_row - start_row + 1 - len(block))
+                )
+                offsets[a1_range] = end_row + 1
+                if not end_bound or offsets[a1_range] <= end_bound:
+                    next_active.append(a1_range)
+            active = next_active
+
+        for rows in values.values():
+            # The trailing blank rows are dropped as the API does
+            while rows and not rows[-1]:
+                rows.pop()
+        return values
+
     def execute(self):
         if not self._x__ds.opened:
             self._x__ds.open()
-        q = self._x__ds._resource.spreadsheets().values().get(
-            spreadsheetId=self._x__spreadsheet_id, 
-            range=self._x__range
-        ).execute()
-        self._result = q.get('values', [])
+        if self._x__ranges:
+            self._values = self.fetch_ranges(list(self._x__ranges))
+            self._result = list(self._values.items())
+        elif self._x__block_rows:
+            self._values = self.fetch_ranges([self._x__range])
+            self._result = self._values[self._x__range]
+        else:
+            q = self._x__ds._resource.spreadsheets().values().get(
+                spreadsheetId=self._x__spreadsheet_id, 
+                range=self._x__range
+            ).execute()
+            self._result = q.get('values', [])
+            self._values = {self._x__range: self._result}
         return self
 
+    def to_arrow(self):
+        """
+        Return the values as the typed Arrow table.
+
+        The multiple ranges query returns the tables by the ranges.
+        """
+        if self._values is None:
+            self.execute()
+        tables = {
+            a1_range: values_to_table(
+                values, self._x__types, self._x__header
+            )
+            for a1_range, values in self._values.items()
+        }
+        return tables if self._x__ranges else tables[self._x__range]
+
     def __iter__(self):
         return (item for item in self._result)
 
@@ -49,6 +328,11 @@ class GoogleDocResource(BaseResource):
         'https://www.googleapis.com/auth/drive'
     ]
 
+    # The retries of the failed (429, 5xx) requests with the backoff.
+    num_retries = 5
+    # The cells count written by the single request.
+    chunk_cells = 50000
+
     query_cls = GoogleSheetQuery
 
     def open(self):
@@ -73,3 +357,66 @@ class GoogleDocResource(BaseResource):
         sheets = sheets_metadata.get('sheets', [])
         for item in sheets:
             yield item.get('properties', {}).get('title', None)
+
+    def bulk_insert(
+        self,
+        mapper,
+        mappings,
+        truncate: bool = False,
+        spreadsheet_id: str = None,
+        columns=None,
+        header: bool = True,
+        value_input_option: str = "RAW",
+        chunk_cells: int = None,
+        **kwargs
+    ):
+        """
+        Write the mappings into the ``mapper`` range of the spreadsheet.
+
+        The rows are appended by the chunks of about ``chunk_cells`` cells
+        per request. The ``truncate`` clears the range first and writes
+        the ``columns`` header row. Returns the written rows count.
+        """
+        cls = type(self)
+        if not spreadsheet_id:
+            raise ValueError("The `spreadsheet_id` is required")
+        if not self.opened:
+            self.open()
+        values_api = self._resource.spreadsheets().values()
+
+        items = iter(mappings)
+        if not columns:
+            first = next(items, None)
+            columns = list(first.keys()) if first is not None else []
+            if first is not None:
+                items = itertools.chain([first], items)
+        chunk_rows = max(
+            1, (chunk_cells or cls.chunk_cells) // max(1, len(columns))
+        )
+
+        if truncate:
+            values_api.clear(
+                spreadsheetId=spreadsheet_id,
+                range=mapper,
+                body={}
+            ).execute(num_retries=cls.num_retries)
+
+        chunk = [list(columns)] if truncate and header and columns else []
+        rows = -len(chunk)
+        while True:
+            chunk.extend(
+                [to_cell_value(item.get(name)) for name in columns]
+                for item in itertools.islice(items, chunk_rows - len(chunk))
+            )
+            if not chunk:
+                break
+            values_api.append(
+                spreadsheetId=spreadsheet_id,
+                range=mapper,
+                valueInputOption=value_input_option,
+                insertDataOption="INSERT_ROWS",
+                body=dict(values=chunk)
+            ).execute(num_retries=cls.num_retries)
+            rows += len(chunk)
+            chunk = []
+        return rows
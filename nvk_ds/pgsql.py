@@ -2,48 +2,515 @@
 The PostgreSQL dataresource and query classes.
 """
 
+import os
+import re
 import copy
+import json
+import uuid
+import queue
+import collections
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+from psycopg2 import sql
+
+import pyarrow as pa
 
 from .base import BaseResource, BaseQuery
+from .utils import to_stream_pgcopy, json_serialize
+
+
+# The PostgreSQL type OIDs mapped to the Arrow types, the rest are inferred.
+ARROW_TYPES = {
+    16: pa.bool_(),
+    17: pa.binary(),
+    19: pa.string(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    25: pa.string(),
+    114: pa.string(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1042: pa.string(),
+    1043: pa.string(),
+    1082: pa.date32(),
+    1083: pa.time64('us'),
+    1114: pa.timestamp('us'),
+    1184: pa.timestamp('us', tz='UTC'),
+    2950: pa.string(),
+    3802: pa.string(),
+}
+
+# The ``numeric`` type OID, its Arrow type is built by the column precision.
+NUMERIC_OID = 1700
+
+# The converters of the values which have no Arrow counterpart.
+ARROW_CONVERTERS = {
+    17: lambda value: bytes(value),
+    114: lambda value: json.dumps(value, default=json_serialize),
+    2950: str,
+    3802: lambda value: json.dumps(value, default=json_serialize),
+}
+
+
+# The query placeholders in the ``psycopg2`` paramstyle.
+PLACEHOLDER_RE = re.compile(r'%\((\w+)\)s|%s|%%')
+
+# The ending semicolons of the query wrapped into the subquery.
+TRAILING_SEMICOLONS_RE = re.compile(r'[\s;]+$')
+
+# The ``INSERT ... VALUES %s`` query for ``execute_values``.
+VALUES_RE = re.compile(r'\bVALUES\s+%s', re.IGNORECASE)
+
+
+def to_prepared(query_sql: str):
+    """
+    Return the query with the ``$n`` placeholders and the parameters keys.
+
+    The keys are the names of the ``%(name)s`` placeholders or the
+    positions of the ``%s`` ones in the order of the ``$n`` placeholders.
+    """
+    keys = []
+    positions = []
+
+    def replace(match):
+        if match.group(0) == '%%':
+            return '%'
+        key = match.group(1)
+        if key is None:
+            key = len(positions)
+            positions.append(key)
+        if key not in keys:
+            keys.append(key)
+        return '${0}'.format(keys.index(key) + 1)
+
+    return PLACEHOLDER_RE.sub(replace, query_sql), keys
+
+
+class PgSQLConnection(psycopg2.extensions.connection):
+    """The connection keeping the cache of the prepared statements."""
+
+    prepared_cache_size = 100
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = collections.OrderedDict()
+
+    def execute_prepared(self, cursor, query_sql: str, params=None):
+        """
+        Execute the query as the prepared statement.
+
+        The statement is prepared on the first execution of the query text
+        and reused until it is evicted from the least recently used cache.
+        """
+        cls = type(self)
+        entry = self.prepared.get(query_sql)
+        if entry is None:
+            prepared_sql, keys = to_prepared(query_sql)
+            name = 'nvk_ds_{0}'.format(uuid.uuid4().hex)
+            cursor.execute('PREPARE {0} AS {1}'.format(name, prepared_sql))
+            entry = self.prepared[query_sql] = (name, keys)
+            while len(self.prepared) > cls.prepared_cache_size:
+                evicted, _ = self.prepared.popitem(last=False)[1]
+                cursor.execute('DEALLOCATE {0}'.format(evicted))
+        else:
+            self.prepared.move_to_end(query_sql)
+        name, keys = entry
+        if keys:
+            cursor.execute(
+                'EXECUTE {0} ({1})'.format(
+                    name, ', '.join(['%s'] * len(keys))
+                ),
+                [params[key] for key in keys]
+            )
+        else:
+            cursor.execute('EXECUTE {0}'.format(name))
+
+
+def get_arrow_type(column):
+    """
+    Return the Arrow type of the description column or ``None`` to infer it.
+
+    The ``numeric(p, s)`` columns become the decimals, the ``numeric``
+    ones without the precision become the strings.
+    """
+    if column.type_code == NUMERIC_OID:
+        if column.precision and column.precision <= 38:
+            return pa.decimal128(column.precision, max(column.scale or 0, 0))
+        return pa.string()
+    return ARROW_TYPES.get(column.type_code)
+
+
+def to_record_batch(rows, description, types=None) -> pa.RecordBatch:
+    """
+    Return the record batch built column by column from the rows tuples.
+
+    The ``types`` overrides the types of the description columns.
+    """
+    types = types or {}
+    names = [column.name for column in description]
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    arrays = []
+    for column, values in zip(description, columns):
+        arrow_type = types.get(column.name, get_arrow_type(column))
+        converter = ARROW_CONVERTERS.get(column.type_code)
+        if column.type_code == NUMERIC_OID and pa.types.is_string(arrow_type):
+            converter = str
+        if converter is not None:
+            values = [None if value is None else converter(value)
+                      for value in values]
+        arrays.append(pa.array(values, type=arrow_type))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
 
 
 class PgSQLQuery(BaseQuery):
-    
+
+    # The rows count fetched per round-trip by the server-side cursor.
+    default_itersize = 2000
+
     def __init__(self):
+        cls = type(self)
         super().__init__()
         self._x__table_name = ''
         self._x__query = ''
         self._x__params = {}
+
+        # Fetch rows lazily with the named (server-side) cursor.
+        self._x__stream = False
+        self._x__itersize = cls.default_itersize
+        # Yield the lists of rows (one per ``fetchmany``) instead of rows.
+        self._x__batched = False
+        # Execute the query as the prepared statement cached per connection.
+        self._x__prepared = False
+
+        # Split the query by the column ranges fetched in parallel:
+        # ``partitions`` equal ranges between the column min and max values
+        # or the ranges between the explicit sorted ``bounds``.
+        self._x__partition_by = None
+        self._x__partitions = 0
+        self._x__bounds = None
+        # Return the partitions one after another sorted by the column,
+        # otherwise the rows are returned as they come.
+        self._x__ordered = False
+
         self._result = []
+        self._cursor = None
+        self._partition_bounds = None
 
     def _clone(self):
         c = super()._clone()
         c._x__table_name = self._x__table_name
         c._x__query = self._x__query
         c._x__params = copy.copy(self._x__params)
+        c._x__stream = self._x__stream
+        c._x__itersize = self._x__itersize
+        c._x__batched = self._x__batched
+        c._x__prepared = self._x__prepared
+        c._x__partition_by = self._x__partition_by
+        c._x__partitions = self._x__partitions
+        c._x__bounds = copy.copy(self._x__bounds)
+        c._x__ordered = self._x__ordered
         return c
 
+    def build_sql(self) -> str:
+        """Return the query text with the table name substituted."""
+        return str(self._x__query).format(table_name=self._x__table_name) \
+            if self._x__table_name else self._x__query
+
+    def build_subquery_sql(self) -> str:
+        """Return the query text to be wrapped, without the ending ``;``."""
+        return TRAILING_SEMICOLONS_RE.sub('', self.build_sql())
+
     def execute(self):
         if not self._x__ds.opened:
             self._x__ds.open()
-        q = self._x__ds._resource.cursor(
-            cursor_factory=psycopg2.extras.DictCursor
-        )
 
-        query_sql = str(self._x__query).format(table_name=self._x__table_name) \
-            if self._x__table_name else self._x__query
-        
-        q.execute(query_sql, self._x__params)
+        if self._x__partition_by:
+            # The partitions are fetched on iteration.
+            self._partition_bounds = self.get_partition_bounds()
+            self._result = None
+            self._x__ds.release_idle()
+            return self
+
+        if self._x__stream:
+            # The named cursor keeps the result on the server side,
+            # rows are transferred by ``itersize`` on iteration.
+            self._cursor = self._x__ds._resource.cursor(
+                name='nvk_ds_{0}'.format(uuid.uuid4().hex),
+                cursor_factory=psycopg2.extras.DictCursor
+            )
+            self._cursor.itersize = self._x__itersize
+            self._cursor.execute(self.build_sql(), self._x__params)
+            self._result = None
+            return self
+
+        conn = self._x__ds._resource
+        q = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        if self._x__prepared and isinstance(conn, PgSQLConnection):
+            conn.execute_prepared(q, self.build_sql(), self._x__params)
+        else:
+            q.execute(self.build_sql(), self._x__params)
 
         if not q.description:
             self._result = None
         else:
             self._result = q.fetchall()
+        q.close()
+        self._x__ds.release_idle()
+        return self
+
+    def execute_many(
+        self,
+        argslist,
+        page_size: int = 100,
+        template: str = None,
+        fetch: bool = False
+    ):
+        """
+        Execute the query against all the parameters of the ``argslist``.
+
+        The query with the single ``VALUES %s`` placeholder is sent by
+        ``execute_values`` as one statement per page, any other one by
+        ``execute_batch`` as one round-trip per page.
+        """
+        if not self._x__ds.opened:
+            self._x__ds.open()
+        query_sql = self.build_sql()
+        with self._x__ds._resource.cursor(
+            cursor_factory=psycopg2.extras.DictCursor
+        ) as q:
+            if VALUES_RE.search(query_sql):
+                result = psycopg2.extras.execute_values(
+                    q,
+                    query_sql,
+                    argslist,
+                    template=template,
+                    page_size=page_size,
+                    fetch=fetch
+                )
+                self._result = result if fetch else None
+            else:
+                psycopg2.extras.execute_batch(
+                    q, query_sql, argslist, page_size=page_size
+                )
+                self._result = None
         return self
 
+    def get_partition_bounds(self) -> list:
+        """Return the sorted values splitting the partitions ranges."""
+        if self._x__bounds:
+            return sorted(self._x__bounds)
+        cursor = self._x__ds.get_cursor()
+        try:
+            cursor.execute(
+                sql.SQL(
+                    'SELECT min({0}), max({0}) FROM ({1}) AS nvk_ds_p'
+                ).format(
+                    sql.Identifier(self._x__partition_by),
+                    sql.SQL(self.build_subquery_sql())
+                ),
+                self._x__params
+            )
+            min_value, max_value = cursor.fetchone()
+        finally:
+            cursor.close()
+        return split_range(min_value, max_value, self._x__partitions or 1)
+
+    def partition_sql(self, idx: int) -> sql.Composable:
+        """
+        Return the query of the ``idx`` partition.
+
+        The first partition also takes the rows with the ``NULL`` column,
+        the ordered one puts them first.
+        """
+        bounds = self._partition_bounds
+        column = sql.Identifier(self._x__partition_by)
+        conditions = []
+        if idx > 0:
+            conditions.append(sql.SQL('{0} >= {1}').format(
+                column, sql.Literal(bounds[idx - 1])
+            ))
+        if idx < len(bounds):
+            conditions.append(sql.SQL('({0} < {1} OR {0} IS NULL)' if idx == 0
+                                      else '{0} < {1}').format(
+                column, sql.Literal(bounds[idx])
+            ))
+        return sql.SQL(
+            'SELECT * FROM ({0}) AS nvk_ds_p WHERE {1}{2}'
+        ).format(
+            sql.SQL(self.build_subquery_sql()),
+            sql.SQL(' AND ').join(conditions) if conditions
+            else sql.SQL('TRUE'),
+            sql.SQL(' ORDER BY {0} NULLS FIRST').format(column)
+            if self._x__ordered
+            else sql.SQL('')
+        )
+
+    def read_partition(self, ds, idx: int):
+        """Return the iterator of the ``idx`` partition rows batches."""
+        q = self._clone()
+        q._x__ds = ds
+        q._x__table_name = ''
+        q._x__query = self.partition_sql(idx).as_string(ds._resource)
+        q._x__partition_by = None
+        q._x__stream = True
+        return q.execute().iter_batches()
+
+    def fetch_partition(self, idx: int, out: queue.Queue, stop, opened):
+        """
+        Put the ``idx`` partition rows batches into the queue.
+
+        The connection is opened once the preceding partition has opened
+        its own (``opened`` are the events of the partitions), so the
+        pooled connections are taken in the partitions order and waited
+        for without the pool timeout.
+        """
+        ds = self._x__ds.clone(pool_wait=True)
+        try:
+            if idx > 0 and not wait_until(opened[idx - 1], stop):
+                return
+            try:
+                ds.open()
+            finally:
+                opened[idx].set()
+            for rows in self.read_partition(ds, idx):
+                if not put_until(out, rows, stop):
+                    break
+        except Exception as exc:
+            put_until(out, exc, stop)
+        else:
+            put_until(out, None, stop)
+        finally:
+            if ds.opened:
+                ds.rollback()
+            ds.close()
+
+    def get_partition_workers(self, count: int) -> int:
+        """
+        Return the number of the partitions fetched at once.
+
+        In the pooled mode it is limited by the pool connections but the
+        one of the current thread.
+        """
+        ds = self._x__ds
+        if ds is None or not ds.pooled:
+            return count
+        free = ds.get_pool().maxconn - (1 if ds.opened else 0)
+        return max(min(count, free), 1)
+
+    def iter_partitions(self):
+        """
+        Fetch the partitions in parallel and yield the rows batches.
+
+        The producers keep only a few batches per partition: in the ordered
+        mode the following partitions wait until the preceding ones are
+        consumed.
+        """
+        count = len(self._partition_bounds) + 1
+        if self._x__ordered:
+            queues = [queue.Queue(maxsize=2) for _ in range(count)]
+        else:
+            queues = [queue.Queue(maxsize=2 * count)] * count
+        opened = [threading.Event() for _ in range(count)]
+        stop = threading.Event()
+        workers = self.get_partition_workers(count)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for idx in range(count):
+                executor.submit(
+                    self.fetch_partition, idx, queues[idx], stop, opened
+                )
+            try:
+                if self._x__ordered:
+                    for out in queues:
+                        yield from drain_queue(out, 1)
+                else:
+                    yield from drain_queue(queues[0], count)
+            finally:
+                stop.set()
+
+    def iter_batches(self):
+        """Yield the rows lists fetched from the server-side cursor."""
+        cursor, self._cursor = self._cursor, None
+        if cursor is None:
+            return
+        try:
+            while True:
+                rows = cursor.fetchmany(self._x__itersize)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+            self._x__ds.release_idle()
+
+    def iter_rows(self):
+        """Yield the rows fetched from the server-side cursor."""
+        for rows in self.iter_batches():
+            yield from rows
+
+    def iter_record_batches(self, batch_size: int = None):
+        """
+        Execute the query and yield the Arrow record batches.
+
+        The rows are fetched by the server-side cursor as the plain tuples
+        and converted into the typed Arrow columns batch by batch.
+        """
+        if not self._x__ds.opened:
+            self._x__ds.open()
+        batch_size = batch_size or self._x__itersize
+        cursor = self._x__ds._resource.cursor(
+            name='nvk_ds_{0}'.format(uuid.uuid4().hex)
+        )
+        cursor.itersize = batch_size
+        # The types inferred from the first batch are kept for the rest,
+        # but the decimals as their precision depends on the values.
+        types = {}
+        empty = True
+        try:
+            cursor.execute(self.build_sql(), self._x__params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    if empty and cursor.description:
+                        # The empty result still carries the schema.
+                        yield to_record_batch(rows, cursor.description)
+                    break
+                empty = False
+                batch = to_record_batch(rows, cursor.description, types)
+                types.update(
+                    (field.name, field.type) for field in batch.schema
+                    if not pa.types.is_null(field.type)
+                    and not pa.types.is_decimal(field.type)
+                )
+                yield batch
+        finally:
+            cursor.close()
+            self._x__ds.release_idle()
+
+    def to_arrow(self, batch_size: int = None) -> pa.Table:
+        """Execute the query and return the result as the Arrow table."""
+        tables = [
+            pa.Table.from_batches([batch])
+            for batch in self.iter_record_batches(batch_size)
+        ]
+        if not tables:
+            # The query without the result rows description
+            return pa.table({})
+        return pa.concat_tables(tables, promote=True)
+
     def __iter__(self):
+        if self._partition_bounds is not None:
+            batches = self.iter_partitions()
+            return batches if self._x__batched \
+                else itertools.chain.from_iterable(batches)
+        if self._cursor is not None:
+            return self.iter_batches() if self._x__batched \
+                else self.iter_rows()
         return (item for item in self._result)
 
     def to_dict(self):
@@ -53,22 +520,513 @@ class PgSQLQuery(BaseQuery):
         )
 
 
+class PgSQLConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    The thread-safe connections pool.
+
+    Unlike the parent class it waits for a free connection (up to
+    ``timeout`` seconds, forever if it is ``None``) instead of raising
+    ``PoolError`` when all the ``maxconn`` connections are in use. The
+    ``minconn`` connections are opened at once, but up to ``maxconn``
+    returned connections are kept open (with their prepared statements)
+    instead of being closed above ``minconn``. The session state of the
+    returned connection is reset, the connection failed to reset is
+    closed.
+    """
+
+    # The statements resetting the session but the prepared statements.
+    reset_sql = (
+        'RESET ALL; DISCARD TEMP; '
+        'SELECT pg_advisory_unlock_all(); UNLISTEN *'
+    )
+
+    def __init__(self, minconn, maxconn, *args, timeout=None, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._timeout = timeout
+
+    def getconn(self, key=None, wait: bool = False):
+        """Return the connection, ``wait`` for it without the timeout."""
+        if not self._slots.acquire(timeout=None if wait else self._timeout):
+            raise psycopg2.pool.PoolError("connection pool exhausted")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            if not close and not conn.closed:
+                close = not self.reset(conn)
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+    def _putconn(self, conn, key=None, close=False):
+        # The parent keeps only ``minconn`` idle connections, here these
+        # are up to ``maxconn`` ones.
+        if self.closed:
+            raise psycopg2.pool.PoolError("connection pool is closed")
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise psycopg2.pool.PoolError(
+                    "trying to put unkeyed connection"
+                )
+        if close or conn.closed or len(self._pool) >= self.maxconn \
+                or conn.info.transaction_status \
+                != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.close()
+        else:
+            self._pool.append(conn)
+        if not self.closed or key in self._used:
+            del self._used[key]
+            del self._rused[id(conn)]
+
+    @classmethod
+    def reset(cls, conn) -> bool:
+        """
+        Roll back the connection and reset its session state.
+
+        The settings, temporary tables, advisory locks and listened
+        channels are reset, the prepared statements are kept. Returns
+        whether or not the connection is reset.
+        """
+        try:
+            conn.rollback()
+            with conn.cursor() as cursor:
+                cursor.execute(cls.reset_sql)
+            conn.commit()
+        except psycopg2.Error:
+            return False
+        return True
+
+    @staticmethod
+    def is_healthy(conn) -> bool:
+        """Return whether or not the connection is alive."""
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def checkout(self, check: bool = True, wait: bool = False):
+        """Return the connection which passed the health check."""
+        for _ in range(self.maxconn + 1):
+            conn = self.getconn(wait=wait)
+            if not check or self.is_healthy(conn):
+                return conn
+            self.putconn(conn, close=True)
+        raise psycopg2.OperationalError("no healthy connection in the pool")
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn: str, minconn: int, maxconn: int, **kwargs):
+    """
+    Return the process-wide connections pool for the DSN.
+
+    The pool is created with the parameters of the first call.
+    """
+    key = (os.getpid(), dsn)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = PgSQLConnectionPool(
+                minconn, maxconn, dsn, **kwargs
+            )
+    return pool
+
+
+def split_range(min_value, max_value, count: int) -> list:
+    """Return the values splitting the range into ``count`` equal parts."""
+    if min_value is None or max_value is None:
+        return []
+    bounds = []
+    for idx in range(1, count):
+        step = (max_value - min_value) * idx
+        value = min_value + (step // count if isinstance(step, int)
+                             else step / count)
+        if value > min_value and (not bounds or value > bounds[-1]):
+            bounds.append(value)
+    return bounds
+
+
+def put_until(out: queue.Queue, item, stop) -> bool:
+    """Put the item into the queue unless the ``stop`` event is set."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def wait_until(event: threading.Event, stop) -> bool:
+    """Wait for the event unless the ``stop`` event is set."""
+    while not stop.is_set():
+        if event.wait(timeout=0.1):
+            return True
+    return False
+
+
+def drain_queue(out: queue.Queue, count: int):
+    """
+    Yield the queue items until the ``count`` producers are done.
+
+    The producer puts ``None`` when done or the raised exception.
+    """
+    while count:
+        item = out.get()
+        if item is None:
+            count -= 1
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            yield item
+
+
+def table_identifier(table_name: str) -> sql.Identifier:
+    """Return the quoted (optionally schema qualified) table name."""
+    return sql.Identifier(*table_name.split('.'))
+
+
 class PgSQLResource(BaseResource):
 
+    # The rows count sent by the single ``COPY`` command.
+    copy_chunk_size = 100000
+    # The staging rows count merged by the single ``INSERT ... ON CONFLICT``.
+    merge_batch_size = 50000
+
+    # The pooled mode (``pooled=True``) defaults, the free connection is
+    # waited for up to ``pool_timeout`` seconds.
+    pool_minconn = 1
+    pool_maxconn = 10
+    pool_timeout = 60
+
     query_cls = PgSQLQuery
 
+    def __init__(self, *args, **kwargs):
+        self._local = threading.local()
+        self._connection = None
+        super().__init__(*args, **kwargs)
+
+    @property
+    def pooled(self) -> bool:
+        """Return if the connections are taken from the process-wide pool."""
+        return bool(self._kwargs.get('pooled', False))
+
+    @property
+    def _resource(self):
+        # The pooled connection belongs to the thread which checked it out
+        # until it is returned to the pool.
+        if self.pooled:
+            return getattr(self._local, 'connection', None)
+        return self._connection
+
+    @_resource.setter
+    def _resource(self, value):
+        if self.pooled:
+            self._local.connection = value
+        else:
+            self._connection = value
+
+    def clone(self, **kwargs):
+        """Return the unopened resource with the same (or given) settings."""
+        return type(self)(
+            self._config,
+            readonly=self.readonly,
+            **dict(self._kwargs, **kwargs)
+        )
+
+    def get_pool(self):
+        cls = type(self)
+        return get_pool(
+            self._config,
+            self._kwargs.get('minconn', cls.pool_minconn),
+            self._kwargs.get('maxconn', cls.pool_maxconn),
+            timeout=self._kwargs.get('pool_timeout', cls.pool_timeout),
+            connection_factory=PgSQLConnection
+        )
+
     def open(self):
-        self._resource = psycopg2.connect(self._config)
+        if self.pooled:
+            self._resource = self.get_pool().checkout(
+                check=self._kwargs.get('pool_check', True),
+                wait=self._kwargs.get('pool_wait', False)
+            )
+        else:
+            self._resource = psycopg2.connect(
+                self._config,
+                connection_factory=PgSQLConnection
+            )
+
+    def release(self):
+        """Return the connection of the current thread to the pool."""
+        conn, self._resource = self._resource, None
+        if conn is not None:
+            self.get_pool().putconn(conn)
+
+    def release_idle(self):
+        """
+        Return the connection of the current thread to the pool unless its
+        transaction has written anything.
+
+        It is called when the query is done, so the read-only tasks which
+        never commit do not keep the connections. The written transaction
+        is kept until ``commit`` or ``rollback``.
+        """
+        if not self.pooled or not self.opened:
+            return
+        conn = self._resource
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT txid_current_if_assigned()')
+                (txid,) = cursor.fetchone()
+            if txid is not None:
+                return
+        self.rollback()
 
     def close(self):
-        if self.opened:
+        if self.pooled:
+            # The connections of the other threads are returned by their
+            # queries, ``commit`` or ``rollback`` as they may be in use.
+            self.release()
+        elif self.opened:
             self._resource.close()
+            self._resource = None
 
     def get_cursor(self):
         return self._resource.cursor()
 
     def commit(self):
+        # The pooled connection could be already released
+        if not self.opened:
+            return
         self._resource.commit()
+        if self.pooled:
+            self.release()
 
     def rollback(self):
+        if not self.opened:
+            return
         self._resource.rollback()
+        if self.pooled:
+            self.release()
+
+    def copy_from(self, cursor, table, columns, mappings, chunk_size=None):
+        """Load the mappings into the table by ``COPY ... FROM STDIN``."""
+        cls = type(self)
+        chunk_size = chunk_size or cls.copy_chunk_size
+        copy_sql = sql.SQL('COPY {0} ({1}) FROM STDIN').format(
+            table,
+            sql.SQL(', ').join(sql.Identifier(name) for name in columns)
+        ).as_string(cursor)
+        rows = 0
+        items = iter(mappings)
+        while True:
+            chunk = list(itertools.islice(items, chunk_size))
+            if not chunk:
+                break
+            cursor.copy_expert(copy_sql, to_stream_pgcopy(chunk, columns))
+            rows += len(chunk)
+        return rows
+
+    def bulk_insert(
+        self,
+        mapper,
+        mappings,
+        truncate: bool = False,
+        columns=None,
+        chunk_size=None,
+        commit: bool = True,
+        **kwargs
+    ):
+        """
+        Load the mappings into the ``mapper`` table using ``COPY``.
+
+        The mappings are consumed lazily by ``chunk_size`` rows, the columns
+        are taken from the first mapping unless given. The table truncation
+        and the loading are done within the same transaction.
+        """
+        if not self.opened:
+            self.open()
+
+        items = iter(mappings)
+        if not columns:
+            first = next(items, None)
+            if first is not None:
+                columns = list(first.keys())
+                items = itertools.chain([first], items)
+
+        table = table_identifier(mapper)
+        cursor = self.get_cursor()
+        try:
+            if truncate:
+                cursor.execute(sql.SQL('TRUNCATE {0}').format(table))
+            # The empty mappings without the columns have nothing to copy
+            rows = self.copy_from(
+                cursor, table, columns, items, chunk_size
+            ) if columns else 0
+        except Exception:
+            self.rollback()
+            raise
+        else:
+            if commit:
+                self.commit()
+        finally:
+            cursor.close()
+        return rows
+
+    @staticmethod
+    def get_text_compared(cursor, table, columns) -> set:
+        """
+        Return the table columns compared as the text.
+
+        These are the columns of the types without the equality operator
+        (e.g. ``json``, ``xml``, ``point``).
+        """
+        cursor.execute(
+            'SELECT a.attname FROM pg_attribute a '
+            'WHERE a.attrelid = %s::regclass AND a.attnum > 0 '
+            'AND NOT a.attisdropped AND NOT EXISTS ('
+            'SELECT 1 FROM pg_operator o WHERE o.oprname = \'=\' '
+            'AND o.oprleft = a.atttypid AND o.oprright = a.atttypid)',
+            (table.as_string(cursor),)
+        )
+        return {name for (name,) in cursor.fetchall()} & set(columns)
+
+    @staticmethod
+    def build_merge_sql(table, staging, columns, key, text_compared=()):
+        """
+        Return the query merging the staging rows range into the table.
+
+        The rows equal to the existing ones are not updated, the
+        ``text_compared`` columns are compared as the text.
+        """
+        target = sql.Identifier('nvk_ds_target')
+        row_id = sql.Identifier('nvk_ds_row_id')
+        fields = sql.SQL(', ').join(sql.Identifier(name) for name in columns)
+        key_fields = sql.SQL(', ').join(sql.Identifier(name) for name in key)
+
+        def compared(source, name):
+            expr = sql.SQL('{0}.{1}').format(source, sql.Identifier(name))
+            if name in text_compared:
+                return sql.SQL('{0}::text').format(expr)
+            return expr
+
+        values = [name for name in columns if name not in key]
+        if values:
+            on_conflict = sql.SQL(
+                'DO UPDATE SET ({0}) = ROW({1}) '
+                'WHERE ({2}) IS DISTINCT FROM ({3})'
+            ).format(
+                sql.SQL(', ').join(sql.Identifier(name) for name in values),
+                sql.SQL(', ').join(
+                    sql.SQL('EXCLUDED.{0}').format(sql.Identifier(name))
+                    for name in values
+                ),
+                sql.SQL(', ').join(
+                    compared(target, name) for name in values
+                ),
+                sql.SQL(', ').join(
+                    compared(sql.SQL('EXCLUDED'), name) for name in values
+                )
+            )
+        else:
+            on_conflict = sql.SQL('DO NOTHING')
+        return sql.SQL(
+            'INSERT INTO {table} AS {target} ({fields}) '
+            'SELECT DISTINCT ON ({key}) {fields} FROM {staging} '
+            'WHERE {row_id} > %s AND {row_id} <= %s '
+            'ORDER BY {key}, {row_id} DESC '
+            'ON CONFLICT ({key}) {on_conflict} '
+            'RETURNING (xmax = 0) AS inserted'
+        ).format(
+            table=table,
+            target=target,
+            fields=fields,
+            key=key_fields,
+            staging=staging,
+            row_id=row_id,
+            on_conflict=on_conflict
+        )
+
+    def merge(
+        self,
+        mapper,
+        mappings,
+        key,
+        columns=None,
+        chunk_size=None,
+        batch_size=None,
+        commit: bool = True
+    ) -> dict:
+        """
+        Upsert the mappings into the ``mapper`` table by the ``key`` columns.
+
+        The mappings are copied into a temporary staging table and merged
+        into the target with ``INSERT ... ON CONFLICT DO UPDATE`` by
+        ``batch_size`` staging rows. The rows equal to the existing ones are
+        left untouched. Returns the inserted and updated rows counts.
+        """
+        cls = type(self)
+        batch_size = batch_size or cls.merge_batch_size
+        key = [key] if isinstance(key, str) else list(key)
+        result = dict(inserted=0, updated=0)
+        if not self.opened:
+            self.open()
+
+        items = iter(mappings)
+        if not columns:
+            first = next(items, None)
+            if first is None:
+                return result
+            columns = list(first.keys())
+            items = itertools.chain([first], items)
+
+        table = table_identifier(mapper)
+        staging = sql.Identifier('nvk_ds_staging_{0}'.format(uuid.uuid4().hex))
+        row_id = sql.Identifier('nvk_ds_row_id')
+        fields = sql.SQL(', ').join(sql.Identifier(name) for name in columns)
+        cursor = self.get_cursor()
+        try:
+            cursor.execute(
+                sql.SQL(
+                    'CREATE TEMPORARY TABLE {0} ON COMMIT DROP AS '
+                    'SELECT {1} FROM {2} WITH NO DATA'
+                ).format(staging, fields, table)
+            )
+            cursor.execute(
+                sql.SQL('ALTER TABLE {0} ADD COLUMN {1} BIGSERIAL').format(
+                    staging, row_id
+                )
+            )
+            rows = self.copy_from(cursor, staging, columns, items, chunk_size)
+            merge_sql = cls.build_merge_sql(
+                table, staging, columns, key,
+                self.get_text_compared(cursor, table, columns)
+            )
+            for offset in range(0, rows, batch_size):
+                cursor.execute(merge_sql, (offset, offset + batch_size))
+                for (inserted,) in cursor.fetchall():
+                    result['inserted' if inserted else 'updated'] += 1
+            cursor.execute(sql.SQL('DROP TABLE {0}').format(staging))
+        except Exception:
+            self.rollback()
+            raise
+        else:
+            if commit:
+                self.commit()
+        finally:
+            cursor.close()
+        return result
@@ -6,25 +6,74 @@ The ``RestAPI`` data resource classes.
 
 import copy
 import json
+import time
+import random
+import itertools
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import requests
+from requests.adapters import HTTPAdapter
 import prefect
 
 from .base import BaseResource, BaseQuery
-from .utils import is_abs_url
+from .cache import ResponseCache
+from .exc import ResourceError
+from .utils import is_abs_url, json_loads, Projection
 
 logger = prefect.context.get("logger")
 
 
-class RequestError(Exception):
+class RequestError(ResourceError):
     pass
 
 
+class TokenBucket:
+    """The thread-safe token bucket rate limiter."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(self.rate, 1))
+        if self.rate <= 0:
+            raise ValueError("The rate must be positive")
+        if self.capacity < 1:
+            raise ValueError("The capacity must be at least one token")
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        """Wait until the tokens are available and take them."""
+        if tokens > self.capacity:
+            raise ValueError("The tokens exceed the capacity")
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+
+
 class RestAPIQuery(BaseQuery):
     """The base class for all REST-API datasources."""    
     default_pagesize = 50
-    default_attempts = 1
+    default_attempts = 3
+
+    # The query parameters of the page number and offset paging.
+    page_param = "page"
+    offset_param = "offset"
+    pagesize_param = "per_page"
+    first_page = 1
 
     def __init__(self, **q_attrs):
         cls = type(self)
@@ -42,12 +91,27 @@ class RestAPIQuery(BaseQuery):
         self._x__json = {}
         self._x__pagesize = q_attrs.get("pagesize", cls.default_pagesize)
         self._x__limit = 0
+        # The page number (``page``) or offset (``offset``) paging, such
+        # pages are fetched by ``workers`` concurrent requests.
+        self._x__paging = None
+        self._x__workers = 1
+        # Fetch the pages on iteration, as they are consumed.
+        self._x__stream = False
+        # The JSON paths (or the row keys to paths mapping) of the page
+        # items fields, the pages data become the lists of flat rows.
+        self._x__fields = None
+        # The idempotent requests are retried, by default these are the
+        # requests with the idempotent HTTP methods.
+        self._x__idempotent = None
         try:
-            self._x__attempts = int(q_attrs.get("attemps", cls.default_attempts))
+            self._x__attempts = int(q_attrs.get(
+                "attempts", q_attrs.get("attemps", cls.default_attempts)
+            ))
         except (TypeError, ValueError):
-            self._x_attempts = cls.default_attempts
+            self._x__attempts = cls.default_attempts
         self._result = []
         self._response = None
+        self._projection = None
 
     def _clone(self):
         """Clone the instance and its attriobutes."""
@@ -61,7 +125,12 @@ class RestAPIQuery(BaseQuery):
         c._x__pagesize = self._x__pagesize
         c._x__limit = self._x__limit
         c._x__attempts = self._x__attempts
+        c._x__idempotent = self._x__idempotent
         c._x__paged = self._x__paged
+        c._x__paging = self._x__paging
+        c._x__workers = self._x__workers
+        c._x__stream = self._x__stream
+        c._x__fields = copy.copy(self._x__fields)
         return c
 
     @property
@@ -75,7 +144,7 @@ class RestAPIQuery(BaseQuery):
 
     def get_next_page(self, response_data: dict) -> dict:
         """Returns the next page data."""
-        return not self._x__paged
+        return None
 
     @staticmethod
     def get_data(response_data):
@@ -83,11 +152,25 @@ class RestAPIQuery(BaseQuery):
             if isinstance(response_data, dict) and "data" in response_data \
                 else response_data
 
-    def execute(self):
-        """Executes the query and returns data."""
+    def apply_page_data(self, q_attrs, next_page):
+        _attrs = copy.copy(q_attrs)
+        _attrs["params"] = dict(_attrs.get("params", {}), **next_page)
+        return _attrs
+
+    def get_page_params(self, page_idx: int) -> dict:
+        """Returns the ``page_idx`` page (from zero) query parameters."""
         cls = type(self)
-        if not self._x__ds.opened:
-            self._x__ds.open()        
+        if self._x__paging == "offset":
+            return {
+                cls.offset_param: page_idx * self._x__pagesize,
+                cls.pagesize_param: self._x__pagesize
+            }
+        return {
+            cls.page_param: cls.first_page + page_idx,
+            cls.pagesize_param: self._x__pagesize
+        }
+
+    def build_request_attrs(self) -> dict:
         q_attrs = {}
         if self._x__headers:
             q_attrs["headers"] = self._x__headers
@@ -97,36 +180,180 @@ class RestAPIQuery(BaseQuery):
             q_attrs["data"] = self._x__data
         if self._x__json:
             q_attrs["json"] = self._x__json
-        request_meth = getattr(
-            self._x__ds._resource, 
-            self._x__http_method
+        return q_attrs
+
+    def send(self, q_attrs: dict):
+        """Sends the request and returns the successful response."""
+        response = self._response = self._x__ds.request(
+            self._x__http_method,
+            self.build_url(),
+            attempts=self._x__attempts,
+            idempotent=self._x__idempotent,
+            **q_attrs
+        )
+        if not response.ok and response.status_code != 304:
+            raise RequestError(
+                "{0} {1}: {2}".format(
+                    response.status_code, response.reason, response.url
+                ),
+                code=response.status_code
+            )
+        return response
+
+    @staticmethod
+    def decode(response):
+        """
+        Returns the decoded response data.
+
+        The empty body has no data, the invalid one raises ``RequestError``
+        instead of being taken for the end of the pages.
+        """
+        if not response.content or not response.content.strip():
+            return None
+        try:
+            return json_loads(response.content)
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+            raise RequestError(
+                "Invalid JSON response: {0}".format(response.url),
+                code=response.status_code
+            )
+
+    def get_rows(self, response_data):
+        """Returns the page data projected into the flat rows if required."""
+        data = type(self).get_data(response_data)
+        if self._projection is not None and isinstance(data, list):
+            return [self._projection(item) for item in data]
+        return data
+
+    def fetch_page(self, q_attrs: dict):
+        """
+        Requests the page and returns the response data.
+
+        The ``GET`` responses are taken from the resource cache if any:
+        the fresh entry is used as is, the stale one is revalidated by the
+        conditional request and reused on the ``304 Not Modified``.
+        """
+        cls = type(self)
+        cache = getattr(self._x__ds, "cache", None)
+        if cache is None or self._x__http_method.upper() != "GET":
+            return cls.decode(self.send(q_attrs))
+
+        key = cache.make_key(
+            self.build_url(),
+            q_attrs.get("params"),
+            q_attrs.get("headers")
         )
-        if request_meth and callable(request_meth):
-            response_data = None
-            next_page = None
-            page_idx = 0
-        
-            while True:
-                if next_page:
-                    q_attrs = self.apply_page_data(q_attrs, next_page)
-                self._response = request_meth(self.build_url(), **q_attrs)
-                if self._response.ok:
-                    try:
-                        response_data = self._response.json()
-                    except json.decoder.JSONDecodeError:
+        entry = cache.get(key)
+        if entry is not None:
+            if cache.is_fresh(entry):
+                return entry["data"]
+            q_attrs = dict(
+                q_attrs,
+                headers=dict(
+                    q_attrs.get("headers", {}),
+                    **cache.get_validators(entry)
+                )
+            )
+        response = self.send(q_attrs)
+        if response.status_code == 304 and entry is not None:
+            return cache.refresh(key, entry)["data"]
+        response_data = cls.decode(response)
+        if response_data is not None:
+            cache.set(
+                key,
+                response_data,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+        return response_data
+
+    def iter_pages_concurrently(self, q_attrs: dict):
+        """
+        Fetches the numbered pages by the concurrent requests.
+
+        Up to ``workers`` pages are requested at once, the pages data are
+        yielded in the pages order. The fetching stops on the empty page or
+        the page shorter than the first one: the API may return less items
+        than the requested page size.
+        """
+        futures = {}
+        next_idx = 0
+        full_size = None
+        with ThreadPoolExecutor(max_workers=self._x__workers) as executor:
+            try:
+                pages = range(self._x__limit) if self._x__limit \
+                    else itertools.count()
+                for page_idx in pages:
+                    while len(futures) < self._x__workers and \
+                            (not self._x__limit or next_idx < self._x__limit):
+                        futures[next_idx] = executor.submit(
+                            self.fetch_page,
+                            self.apply_page_data(
+                                q_attrs, self.get_page_params(next_idx)
+                            )
+                        )
+                        next_idx += 1
+                    response_data = futures.pop(page_idx).result()
+                    if response_data is None:
+                        break
+                    data = self.get_rows(response_data)
+                    if not data:
                         break
-                    else:
-                        self._result.append(cls.get_data(response_data))
-                next_page = self.get_next_page(response_data)
-                if not next_page:
-                    break
-                page_idx += 1
-                if self._x__limit and page_idx == self._x__limit:
-                    break
-            
+                    yield data
+                    if not isinstance(data, list):
+                        continue
+                    if full_size is None:
+                        full_size = len(data)
+                    elif len(data) < full_size:
+                        break
+            finally:
+                for future in futures.values():
+                    future.cancel()
+
+    def iter_pages_serially(self, q_attrs: dict):
+        """Fetches the pages one by one following ``get_next_page``."""
+        next_page = None
+        page_idx = 0
+        while True:
+            if next_page:
+                q_attrs = self.apply_page_data(q_attrs, next_page)
+            response_data = self.fetch_page(q_attrs)
+            if response_data is None:
+                break
+            yield self.get_rows(response_data)
+            next_page = self.get_next_page(response_data)
+            if not next_page:
+                break
+            page_idx += 1
+            if self._x__limit and page_idx == self._x__limit:
+                break
+
+    def iter_pages(self):
+        """
+        Yields the pages data as they are fetched.
+
+        The next page is requested only when the previous one is consumed.
+        """
+        if not self._x__ds.opened:
+            self._x__ds.open()
+        self._projection = Projection(self._x__fields) \
+            if self._x__fields else None
+        q_attrs = self.build_request_attrs()
+        if self._x__paging:
+            return self.iter_pages_concurrently(q_attrs)
+        return self.iter_pages_serially(q_attrs)
+
+    def execute(self):
+        """Executes the query and returns data."""
+        if not self._x__ds.opened:
+            self._x__ds.open()
+        if not self._x__stream:
+            self._result.extend(self.iter_pages())
         return self
 
     def __iter__(self):
+        if self._x__stream:
+            return self.iter_pages()
         return (item for item in self._result)
 
     def to_dict(self):
@@ -145,13 +372,192 @@ class RestAPIResource(BaseResource):
 
     query_cls = RestAPIQuery
 
+    # The retried responses statuses and the requests methods.
+    retry_statuses = (429, 500, 502, 503, 504)
+    idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+    # The retry delay is random up to ``backoff_factor * 2 ** attempt``.
+    backoff_factor = 0.5
+    backoff_max = 60
+
+    # The ``HTTPAdapter`` connections pool defaults.
+    pool_connections = 10
+    pool_maxsize = 10
+
+    # The ``fan_out`` requests in flight.
+    fan_out_workers = 8
+
     def __init__(self, *args, **q_attrs):
         super().__init__(*args, **q_attrs)
         if isinstance(self._config, dict) and "api_url" in self._config:
             self.base_url = self._config["api_url"]
 
+        # The requests per second limit shared by all the queries.
+        rate_limit = self._kwargs.get("rate_limit")
+        self.rate_limiter = TokenBucket(
+            rate_limit, self._kwargs.get("rate_burst")
+        ) if rate_limit else None
+        # The throttled resource holds all the requests until this time.
+        self._resume_at = 0
+        self._lock = threading.Lock()
+        # The on-disk cache of the ``GET`` responses.
+        cache_dir = self._kwargs.get("cache_dir")
+        self.cache = ResponseCache(
+            cache_dir,
+            ttl=self._kwargs.get("cache_ttl"),
+            max_size=self._kwargs.get("cache_max_size")
+        ) if cache_dir else None
+
     def open(self):
+        cls = type(self)
         self._resource = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self._kwargs.get(
+                "pool_connections", cls.pool_connections
+            ),
+            pool_maxsize=self._kwargs.get("pool_maxsize", cls.pool_maxsize),
+            pool_block=self._kwargs.get("pool_block", False)
+        )
+        self._resource.mount("https://", adapter)
+        self._resource.mount("http://", adapter)
+        if not self._kwargs.get("keep_alive", True):
+            self._resource.headers["Connection"] = "close"
+
+    def get_backoff(self, attempt: int) -> float:
+        """Returns the random delay before the next attempt."""
+        cls = type(self)
+        backoff_factor = self._kwargs.get("backoff_factor", cls.backoff_factor)
+        backoff_max = self._kwargs.get("backoff_max", cls.backoff_max)
+        return random.uniform(
+            0, min(backoff_max, backoff_factor * 2 ** attempt)
+        )
+
+    @staticmethod
+    def get_retry_after(response) -> float:
+        """Returns the ``Retry-After`` header delay in seconds."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(
+            0.0, (retry_at - datetime.now(timezone.utc)).total_seconds()
+        )
+
+    def throttle(self, delay: float):
+        """Holds all the resource requests for the ``delay`` seconds."""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def request(
+        self,
+        http_method: str,
+        url: str,
+        attempts: int = 1,
+        idempotent: bool = None,
+        **q_attrs
+    ):
+        """
+        Sends the request respecting the rate limit.
+
+        The idempotent request is repeated up to ``attempts`` times on the
+        connection errors and the ``retry_statuses`` responses with the
+        exponential backoff, ``Retry-After`` of the 429 and 503 responses
+        (up to ``backoff_max`` seconds) holds all the resource requests.
+        """
+        cls = type(self)
+        http_method = http_method.upper()
+        if idempotent is None:
+            idempotent = http_method in cls.idempotent_methods
+        attempts = max(1, attempts or 1) if idempotent else 1
+        for attempt in range(attempts):
+            delay = self._resume_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self._resource.request(http_method, url, **q_attrs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt + 1 >= attempts:
+                    raise
+                delay = self.get_backoff(attempt)
+                logger.warning("{0} {1}: {2}, retry in {3:.1f}s".format(
+                    http_method, url, exc, delay
+                ))
+            else:
+                if response.status_code not in cls.retry_statuses \
+                        or attempt + 1 >= attempts:
+                    return response
+                delay = self.get_backoff(attempt)
+                if response.status_code in (429, 503):
+                    retry_after = cls.get_retry_after(response)
+                    if retry_after is not None:
+                        delay = min(retry_after, self._kwargs.get(
+                            "backoff_max", cls.backoff_max
+                        ))
+                        self.throttle(delay)
+                logger.warning("{0} {1}: {2}, retry in {3:.1f}s".format(
+                    http_method, url, response.status_code, delay
+                ))
+            time.sleep(delay)
+
+    def fan_out(
+        self,
+        items,
+        url: str = None,
+        max_workers: int = None,
+        **q_attrs
+    ):
+        """
+        Requests the URL per item concurrently, yields ``(item, result)``.
+
+        The item is substituted into the ``url`` template as ``{id}`` or is
+        the URL itself, the other query attributes (``http_method``,
+        ``params`` etc.) are common. The result is the response data or the
+        raised exception. Up to ``max_workers`` requests are in flight, the
+        pairs are yielded as the requests complete.
+        """
+        cls = type(self)
+        max_workers = max_workers \
+            or self._kwargs.get("fan_out_workers", cls.fan_out_workers)
+        if not self.opened:
+            self.open()
+
+        def fetch(item):
+            q = self.build_query(
+                url=url.format(id=item) if url else item,
+                **q_attrs
+            )
+            return next(q.iter_pages(), None)
+
+        items = iter(items)
+        pending = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                while True:
+                    for item in itertools.islice(
+                        items, max_workers - len(pending)
+                    ):
+                        pending[executor.submit(fetch, item)] = item
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        item = pending.pop(future)
+                        exc = future.exception()
+                        yield item, exc if exc is not None \
+                            else future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
 
     def close(self):
         pass
@@ -159,6 +565,22 @@ class RestAPIResource(BaseResource):
 
 class IntercomQuery(RestAPIQuery):
 
+    def __init__(self, **q_attrs):
+        super().__init__(**q_attrs)
+        # Split the search by the ``slice_by`` timestamp field (e.g.
+        # ``updated_at``) into ``slices`` windows of the ``slice_range``
+        # (the earliest record time and now by default) fetched in parallel.
+        self._x__slice_by = None
+        self._x__slices = 0
+        self._x__slice_range = None
+
+    def _clone(self):
+        c = super()._clone()
+        c._x__slice_by = self._x__slice_by
+        c._x__slices = self._x__slices
+        c._x__slice_range = self._x__slice_range
+        return c
+
     def get_next_page(self, response_data: dict) -> dict:
         """Returns the next page data."""
         if self._x__paged:
@@ -174,9 +596,102 @@ class IntercomQuery(RestAPIQuery):
 
     def apply_page_data(self, q_attrs, next_page):
         _attrs = copy.copy(q_attrs)
-        _attrs.setdefault("json", {})["pagination"] = next_page
+        _attrs["json"] = dict(_attrs.get("json", {}), pagination=next_page)
         return _attrs
 
+    def with_filters(self, *filters):
+        """Returns the query with the search filters added by ``AND``."""
+        c = self._clone()
+        c._x__slice_by = None
+        c._x__json = copy.deepcopy(self._x__json)
+        query = c._x__json.get("query")
+        if query and query.get("operator") == "AND":
+            query["value"].extend(filters)
+        else:
+            c._x__json["query"] = dict(
+                operator="AND",
+                value=([query] if query else []) + list(filters)
+            )
+        return c
+
+    def get_search_idempotent(self) -> bool:
+        """The search requests are read only and are retried by default."""
+        return True if self._x__idempotent is None else self._x__idempotent
+
+    def get_slice_range(self):
+        """Returns the ``slice_by`` field range to be split into windows."""
+        if self._x__slice_range:
+            return self._x__slice_range
+        c = self._clone()
+        c._x__slice_by = None
+        c._x__paged = False
+        c._x__fields = None
+        c._x__idempotent = self.get_search_idempotent()
+        c._x__json = dict(
+            copy.deepcopy(self._x__json),
+            sort=dict(field=self._x__slice_by, order="ascending"),
+            pagination=dict(per_page=1)
+        )
+        data = next(c.iter_pages(), None)
+        if not data:
+            return None
+        return data[0][self._x__slice_by], int(time.time()) + 1
+
+    def fetch_window(self, start: int, end: int) -> list:
+        """Fetches the pages data of the ``[start, end)`` window."""
+        c = self.with_filters(
+            dict(field=self._x__slice_by, operator=">", value=start - 1),
+            dict(field=self._x__slice_by, operator="<", value=end)
+        )
+        c._x__paged = True
+        # The items are projected after the de-duplication by ``id``
+        c._x__fields = None
+        c._x__idempotent = self.get_search_idempotent()
+        return list(c.iter_pages())
+
+    def iter_pages_sliced(self):
+        """
+        Fetches the time windows in parallel and yields their pages data.
+
+        The items are de-duplicated by ``id`` as an item updated during
+        the extraction may move from one window to another.
+        """
+        slice_range = self.get_slice_range()
+        if not slice_range:
+            return
+        start, end = slice_range
+        bounds = sorted(set(
+            start + (end - start) * idx // self._x__slices
+            for idx in range(self._x__slices + 1)
+        ))
+        projection = Projection(self._x__fields) \
+            if self._x__fields else None
+        seen = set()
+        with ThreadPoolExecutor(max_workers=len(bounds) - 1 or 1) as executor:
+            for pages in executor.map(
+                lambda window: self.fetch_window(*window),
+                zip(bounds, bounds[1:])
+            ):
+                for data in pages:
+                    page = []
+                    for item in data:
+                        item_id = item.get("id")
+                        if item_id is not None:
+                            if item_id in seen:
+                                continue
+                            seen.add(item_id)
+                        page.append(
+                            projection(item) if projection is not None
+                            else item
+                        )
+                    if page:
+                        yield page
+
+    def iter_pages(self):
+        if self._x__slice_by and self._x__slices:
+            return self.iter_pages_sliced()
+        return super().iter_pages()
+
 
 class IntercomResource(RestAPIResource):
 
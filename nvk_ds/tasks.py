@@ -94,11 +94,45 @@ class DataTask(Task):
         super().__init__(*args, **kwargs)
 
 
+def commit_on_success(dataresource: BaseResource):
+    """
+    Return the task state handler committing the dataresource.
+
+    The dataresource is committed when the task succeeds and is rolled
+    back when it fails, e.g. the incremental ``FSResource`` manifest is
+    written once the task consuming the files has loaded the data. The
+    dataresources without ``commit`` and ``rollback`` are skipped.
+    """
+    def handler(obj: Task, old_state: State, new_state: State):
+        if isinstance(new_state, Success):
+            method = getattr(dataresource, "commit", None)
+        elif isinstance(new_state, Failed):
+            method = getattr(dataresource, "rollback", None)
+        else:
+            method = None
+        if callable(method):
+            method()
+        return new_state
+    return handler
+
+
 class DataResourceTask(Task):
     """
     Task for executing a DML query against a dataresources.
+
+    The dataresource is committed on the task success with
+    ``commit_resource=True``, see ``commit_on_success``.
     """
-    def __init__(self, dataresource: BaseResource, *args, **kwargs):
+    def __init__(
+        self,
+        dataresource: BaseResource,
+        *args,
+        commit_resource: bool = False,
+        **kwargs
+    ):
+        if commit_resource:
+            kwargs.setdefault("state_handlers", [])\
+                .append(commit_on_success(dataresource))
         super().__init__(*args, **kwargs)
         self._resource = dataresource
 
@@ -4,20 +4,26 @@ from typing import Iterable, List, Any
 
 import os
 import io
+import re
 import json
 import uuid
 import argparse
+import warnings
+import itertools
 
-import pandas as pd
-
-from datetime import datetime, date
+from datetime import datetime, date, time
 from urllib.parse import urlparse
 from functools import wraps
 
 import pyarrow as pa
 import pyarrow.parquet as pq
 
-from .validators import is_url, DATETIME_FORMATS, ValidationError
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .validators import is_url, DATETIME_PARSER, ValidationError
 
 
 def json_serialize(obj: Any) -> str:
@@ -31,6 +37,72 @@ def json_serialize(obj: Any) -> str:
     raise TypeError ("Type %s not serializable" % type(obj))
 
 
+def json_loads(content: Any) -> Any:
+    """
+    Decode the JSON document by ``orjson`` if it is installed.
+
+    The documents rejected by ``orjson`` (e.g. with ``NaN``) are decoded
+    by ``json``.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(content)
+
+
+# The JSON path tokens: the ``name`` keys and the ``[0]`` indexes.
+JSON_PATH_RE = re.compile(r"\[(-?\d+)\]|[^.\[\]]+")
+
+
+def compile_json_path(path: str) -> tuple:
+    """Return the keys of the ``a.b[0].c`` like path."""
+    return tuple(
+        int(index) if index else name
+        for index, name in (
+            (match.group(1), match.group(0))
+            for match in JSON_PATH_RE.finditer(path)
+        )
+    )
+
+
+def get_json_path(obj: Any, keys: tuple) -> Any:
+    """Return the value by the compiled path or ``None``."""
+    for key in keys:
+        if isinstance(obj, dict):
+            obj = obj.get(key if isinstance(key, str) else str(key))
+        elif isinstance(obj, list):
+            try:
+                obj = obj[int(key)]
+            except (ValueError, IndexError):
+                return None
+        else:
+            return None
+        if obj is None:
+            return None
+    return obj
+
+
+class Projection:
+    """
+    The projection of the nested objects into the flat rows.
+
+    The fields are the list of the JSON paths or the mapping of the row
+    keys to the JSON paths, the paths are compiled once.
+    """
+
+    def __init__(self, fields):
+        items = fields.items() if isinstance(fields, dict) \
+            else ((path, path) for path in fields)
+        self.fields = [
+            (name, compile_json_path(path)) for name, path in items
+        ]
+
+    def __call__(self, item: Any) -> dict:
+        return {name: get_json_path(item, keys) for name, keys in self.fields}
+
+
 def load_query_from_file(query_file: str, file_format: str = "sql") -> Any:
     with open(query_file, 'r') as fh:
         query = fh.read()
@@ -44,7 +116,17 @@ def load_query_from_file(query_file: str, file_format: str = "sql") -> Any:
 
 
 def cached_data(json_file):
-    """The file based json-like data cache decorator."""
+    """
+    The file based json-like data cache decorator.
+
+    Deprecated: the file is used forever whatever the arguments are,
+    use ``nvk_ds.cache.cached`` instead.
+    """
+    warnings.warn(
+        "`cached_data` is deprecated, use `nvk_ds.cache.cached`",
+        DeprecationWarning,
+        stacklevel=2
+    )
 
     def decorator(fn):
         @wraps(fn)
@@ -69,11 +151,90 @@ def is_abs_url(url):
     except ValidationError:
         return False
 
+# The rows count of the parquet row group.
+PARQUET_ROW_GROUP_SIZE = 100000
+
+
+def write_parquet(
+    items: Iterable[Any],
+    sink: Any,
+    columns: Iterable = None,
+    parquet_schema: Any = None,
+    row_group_size: int = PARQUET_ROW_GROUP_SIZE
+) -> None:
+    """
+    Write the mappings into the sink as the parquet file.
+
+    The Arrow arrays are built column by column right from the mappings by
+    ``row_group_size`` rows and written as the row groups one by one. The
+    columns are taken from the ``parquet_schema``, the ``columns`` or the
+    first mapping. Unless the ``parquet_schema`` is given, the types are
+    inferred from the first row groups: the row groups are kept in memory
+    until every column has got the not null value (or up to the end).
+    """
+    schema = parquet_schema
+    if schema is not None and not isinstance(schema, pa.Schema):
+        schema = pa.schema(schema)
+    names = schema.names if schema is not None \
+        else [getattr(c, "name", str(c)) for c in columns or []]
+    items = iter(items)
+    writer = None
+    # The inferred types and the row groups waiting for the null columns
+    types = {}
+    pending = []
+    try:
+        while True:
+            chunk = list(itertools.islice(items, row_group_size))
+            if not chunk and writer is not None:
+                break
+            if not names and chunk:
+                names = list(chunk[0].keys())
+            arrays = [
+                pa.array(
+                    [item.get(name) for item in chunk],
+                    type=schema.field(name).type if schema is not None
+                    else types.get(name)
+                )
+                for name in names
+            ]
+            table = pa.Table.from_arrays(arrays, schema=schema) \
+                if schema is not None \
+                else pa.Table.from_arrays(arrays, names=names)
+            if writer is None and schema is None:
+                types.update(
+                    (field.name, field.type) for field in table.schema
+                    if not pa.types.is_null(field.type)
+                )
+                pending.append(table)
+                if len(types) < len(names) and chunk:
+                    continue
+                # The columns still null up to the end stay null
+                schema = pa.schema([
+                    (name, types.get(name, pa.null())) for name in names
+                ])
+            if writer is None:
+                writer = pq.ParquetWriter(sink, schema)
+            pending = [
+                table for table in pending if table.num_rows
+            ] or pending[:1]
+            for table in (pending or [table]):
+                writer.write_table(
+                    table.cast(schema), row_group_size=row_group_size
+                )
+            pending = []
+            if not chunk:
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+
+
 def to_stream_gqb(
     items: List[Any], 
     source_format: str = "NEWLINE_DELIMITED_JSON", 
     columns: Iterable = None,
-    parquet_schema: List[Any] = None
+    parquet_schema: List[Any] = None,
+    sink: Any = None
 ) -> io.StringIO:
     if source_format == "NEWLINE_DELIMITED_JSON":
         stream = io.StringIO()
@@ -81,29 +242,72 @@ def to_stream_gqb(
             json.dump(item, stream, default=json_serialize)
             stream.write('\n')
     elif source_format == "PARQUET":
-        stream = io.BytesIO()
-        columns = [getattr(c, "name", str(c))  for c in columns]
-        if not columns and isinstance(items, list) and items:
-            columns = items[0].keys()
-        df = pd.DataFrame(
-            [[item.get(name) for name in columns] for item in items],
-            columns=columns
+        stream = sink if sink is not None else io.BytesIO()
+        write_parquet(
+            items,
+            stream,
+            columns=columns,
+            parquet_schema=parquet_schema
         )
-        pa_table = pa.Table.from_pandas(df, schema=parquet_schema)
-        buf = pa.BufferOutputStream()        
-        pq.write_table(pa_table, buf)
-        stream.write(buf.getvalue())
     stream.seek(0)
     return stream
 
 
-def fromisoformat(value, raise_exc=True):
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r'
+})
+
 
-    for datetime_format in DATETIME_FORMATS:
+def to_copy_value(obj: Any) -> str:
+    """Return the value in the PostgreSQL ``COPY`` text format."""
+    if obj is None:
+        return '\\N'
+    if isinstance(obj, bool):
+        value = 't' if obj else 'f'
+    elif isinstance(obj, (dict, list, tuple)):
+        value = json.dumps(obj, default=json_serialize)
+    elif isinstance(obj, str):
+        value = obj
+    elif isinstance(obj, (int, float)):
+        value = str(obj)
+    elif isinstance(obj, (datetime, date, time)):
+        # The fractional seconds and the offset are kept
+        value = obj.isoformat()
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        # The ``bytea`` hex format
+        value = '\\x' + bytes(obj).hex()
+    else:
         try:
-            return datetime.strptime(value, datetime_format)
-        except ValueError:
-            pass
+            value = json_serialize(obj)
+        except TypeError:
+            value = str(obj)
+    return value.translate(COPY_ESCAPES)
+
+
+def to_stream_pgcopy(
+    items: Iterable[Any],
+    columns: List[str]
+) -> io.StringIO:
+    """Return the stream of the ``COPY ... FROM STDIN`` text format rows."""
+    stream = io.StringIO()
+    for item in items:
+        stream.write('\t'.join(
+            to_copy_value(item.get(name)) for name in columns
+        ))
+        stream.write('\n')
+    stream.seek(0)
+    return stream
+
+
+def fromisoformat(value, raise_exc=True):
+
+    try:
+        return DATETIME_PARSER.parse_value(value)
+    except ValidationError:
+        pass
     if raise_exc:
         raise argparse.ArgumentTypeError(
             "Invalid format: {0}".format(value)
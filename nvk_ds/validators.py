@@ -1,88 +1,122 @@
 """Data values validation."""
 
 import re
+import functools
 from datetime import datetime
 
 import prefect
+import pyarrow as pa
+import pyarrow.compute as pc
 
 logger = prefect.context.get("logger")
 
 
 DATETIME_FORMATS = (
-    "%Y-%m-%dT%H:%M:%s",
+    "%Y-%m-%dT%H:%M:%S.%f",
     "%Y-%m-%dT%H:%M:%S",
-    "%Y-%m-%d %H:%M:%s",
+    "%Y-%m-%d %H:%M:%S.%f",
     "%Y-%m-%d %H:%M:%S",
     "%Y-%m-%d",
-    "%d/%m/%Y %H:%M:%s",
+    "%d/%m/%Y %H:%M:%S.%f",
+    "%d/%m/%Y %H:%M:%S",
     "%d/%m/%Y",
-    "%d.%m.%Y %H:%M:%s",
+    "%d.%m.%Y %H:%M:%S.%f",
+    "%d.%m.%Y %H:%M:%S",
     "%d.%m.%Y"
 )
 
+# The formats parsed by the ISO-8601 parsers of Python and Arrow.
+ISO_FORMATS = frozenset(DATETIME_FORMATS[:5])
+
 
 class ValidationError(Exception):
     """Data validation error."""
 
 
+# The URL pattern, compiled once for ``re`` and for the Arrow (RE2) kernels.
+IP_MIDDLE_OCTET = r"(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5]))"
+IP_LAST_OCTET = r"(?:\.(?:0|[1-9]\d?|1\d\d|2[0-4]\d|25[0-5]))"
+
+URL_PATTERN = (  # noqa: W605
+    r"^"
+    r"(?:(?:https?|ftp)://)"
+    r"(?:[-a-z\u00a1-\uffff0-9._~%!$&'()*+,;=:]+"
+    r"(?::[-a-z0-9._~%!$&'()*+,;=:]*)?@)?"
+    r"(?:"
+    r"(?P<private_ip>"
+    r"(?:(?:10|127)" + IP_MIDDLE_OCTET + r"{2}" + IP_LAST_OCTET + r")|"
+    r"(?:(?:169\.254|192\.168)" + IP_MIDDLE_OCTET + IP_LAST_OCTET + r")|"
+    r"(?:172\.(?:1[6-9]|2\d|3[0-1])" + IP_MIDDLE_OCTET + IP_LAST_OCTET + r"))"
+    r"|"
+    r"(?P<private_host>"
+    r"(?:localhost))"
+    r"|"
+    r"(?P<public_ip>"
+    r"(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])"
+    r"" + IP_MIDDLE_OCTET + r"{2}"
+    r"" + IP_LAST_OCTET + r")"
+    r"|"
+    r"\[("
+    r"([0-9a-fA-F]{1,4}:){7,7}[0-9a-fA-F]{1,4}|"
+    r"([0-9a-fA-F]{1,4}:){1,7}:|"
+    r"([0-9a-fA-F]{1,4}:){1,6}:[0-9a-fA-F]{1,4}|"
+    r"([0-9a-fA-F]{1,4}:){1,5}(:[0-9a-fA-F]{1,4}){1,2}|"
+    r"([0-9a-fA-F]{1,4}:){1,4}(:[0-9a-fA-F]{1,4}){1,3}|"
+    r"([0-9a-fA-F]{1,4}:){1,3}(:[0-9a-fA-F]{1,4}){1,4}|"
+    r"([0-9a-fA-F]{1,4}:){1,2}(:[0-9a-fA-F]{1,4}){1,5}|"
+    r"[0-9a-fA-F]{1,4}:((:[0-9a-fA-F]{1,4}){1,6})|"
+    r":((:[0-9a-fA-F]{1,4}){1,7}|:)|"
+    r"fe80:(:[0-9a-fA-F]{0,4}){0,4}%[0-9a-zA-Z]{1,}|"
+    r"::(ffff(:0{1,4}){0,1}:){0,1}"
+    r"((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}"
+    r"(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])|"
+    r"([0-9a-fA-F]{1,4}:){1,4}:"
+    r"((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}"
+    r"(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])"
+    r")\]|"
+    r"(?:(?:(?:xn--)|[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]-?)*"
+    r"[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]+)"
+    r"(?:\.(?:(?:xn--)|[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]-?)*"
+    r"[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]+)*"
+    r"(?:\.(?:(?:xn--[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]{2,})|"
+    r"[a-z\u00a1-\uffff\U00010000-\U0010ffff]{2,}))"
+    r")"
+    r"(?::\d{2,5})?"
+    r"(?:/[-a-z\u00a1-\uffff\U00010000-\U0010ffff0-9._~%!$&'()*+,;=:@/]*)?"
+    r"(?:\?\S*)?"
+    r"(?:#\S*)?"
+    r"$"
+)
+
+
+def to_re2(pattern: str) -> str:
+    """Return the ``re`` pattern with the unicode escapes in RE2 syntax."""
+    return re.sub(
+        r"\\u([0-9a-fA-F]{4})|\\U([0-9a-fA-F]{8})",
+        lambda match: "\\x{{{0:x}}}".format(
+            int(match.group(1) or match.group(2), 16)
+        ),
+        pattern
+    )
+
+
+URL_RE = re.compile(URL_PATTERN, re.UNICODE | re.IGNORECASE)
+URL_RE2_PATTERN = "(?i)" + to_re2(URL_PATTERN)
+
+SPACES_RE = re.compile(r"\s")
+
+# The Arrow (RE2) patterns of the plain numbers, the whitespaces with the
+# non-breaking ones are the thousands separators. The other values are
+# checked by the scalar validators one by one.
+NUMBER_SPACES_RE = r"[\s\x{00a0}\x{202f}]"
+INT_RE = r"^[-+]?\d{1,19}$"
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+FLOAT_RE = r"^[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?$"
+
+
 def is_url(value: str) -> bool:
     """Return whether or not given value is a valid URL."""
-    ip_middle_octet = r"(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5]))"
-    ip_last_octet = r"(?:\.(?:0|[1-9]\d?|1\d\d|2[0-4]\d|25[0-5]))"
-
-    regex = re.compile(  # noqa: W605
-        r"^"
-        r"(?:(?:https?|ftp)://)"
-        r"(?:[-a-z\u00a1-\uffff0-9._~%!$&'()*+,;=:]+"
-        r"(?::[-a-z0-9._~%!$&'()*+,;=:]*)?@)?"
-        r"(?:"
-        r"(?P<private_ip>"
-        r"(?:(?:10|127)" + ip_middle_octet + r"{2}" + ip_last_octet + r")|"
-        r"(?:(?:169\.254|192\.168)" + ip_middle_octet + ip_last_octet + r")|"
-        r"(?:172\.(?:1[6-9]|2\d|3[0-1])" + ip_middle_octet + ip_last_octet + r"))"
-        r"|"
-        r"(?P<private_host>"
-        r"(?:localhost))"
-        r"|"
-        r"(?P<public_ip>"
-        r"(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])"
-        r"" + ip_middle_octet + r"{2}"
-        r"" + ip_last_octet + r")"
-        r"|"
-        r"\[("
-        r"([0-9a-fA-F]{1,4}:){7,7}[0-9a-fA-F]{1,4}|"
-        r"([0-9a-fA-F]{1,4}:){1,7}:|"
-        r"([0-9a-fA-F]{1,4}:){1,6}:[0-9a-fA-F]{1,4}|"
-        r"([0-9a-fA-F]{1,4}:){1,5}(:[0-9a-fA-F]{1,4}){1,2}|"
-        r"([0-9a-fA-F]{1,4}:){1,4}(:[0-9a-fA-F]{1,4}){1,3}|"
-        r"([0-9a-fA-F]{1,4}:){1,3}(:[0-9a-fA-F]{1,4}){1,4}|"
-        r"([0-9a-fA-F]{1,4}:){1,2}(:[0-9a-fA-F]{1,4}){1,5}|"
-        r"[0-9a-fA-F]{1,4}:((:[0-9a-fA-F]{1,4}){1,6})|"
-        r":((:[0-9a-fA-F]{1,4}){1,7}|:)|"
-        r"fe80:(:[0-9a-fA-F]{0,4}){0,4}%[0-9a-zA-Z]{1,}|"
-        r"::(ffff(:0{1,4}){0,1}:){0,1}"
-        r"((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}"
-        r"(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])|"
-        r"([0-9a-fA-F]{1,4}:){1,4}:"
-        r"((25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])\.){3,3}"
-        r"(25[0-5]|(2[0-4]|1{0,1}[0-9]){0,1}[0-9])"
-        r")\]|"
-        r"(?:(?:(?:xn--)|[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]-?)*"
-        r"[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]+)"
-        r"(?:\.(?:(?:xn--)|[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]-?)*"
-        r"[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]+)*"
-        r"(?:\.(?:(?:xn--[a-z\u00a1-\uffff\U00010000-\U0010ffff0-9]{2,})|"
-        r"[a-z\u00a1-\uffff\U00010000-\U0010ffff]{2,}))"
-        r")"
-        r"(?::\d{2,5})?"
-        r"(?:/[-a-z\u00a1-\uffff\U00010000-\U0010ffff0-9._~%!$&'()*+,;=:@/]*)?"
-        r"(?:\?\S*)?"
-        r"(?:#\S*)?"
-        r"$",
-        re.UNICODE | re.IGNORECASE
-    )
-    pattern = re.compile(regex)
-    if pattern.match(value):
+    if URL_RE.match(value):
         return True
     else:
         raise ValidationError
@@ -91,23 +125,379 @@ def is_url(value: str) -> bool:
 def is_int(value: str) -> int:
     """Return whether or not given value is integer."""
     try:
-        return int(re.sub("\s", "", value))
+        return int(SPACES_RE.sub("", value))
     except (TypeError, ValueError):
         raise ValidationError
 
 
-def is_float(value: str) -> int:
-    """Return whether or not given value is integer."""
+def is_float(value: str) -> float:
+    """Return whether or not given value is float."""
     try:
-        return float(re.sub("\s", "", value).replace(",", "."))
+        return float(SPACES_RE.sub("", value).replace(",", "."))
     except (TypeError, ValueError):
         raise ValidationError
 
 
 def is_datetime(value: str) -> datetime:
-    for datetime_format in DATETIME_FORMATS:
+    """Return the datetime of given value."""
+    return DATETIME_PARSER.parse_value(value)
+
+
+def to_string_array(array) -> pa.Array:
+    """Return the column as the Arrow string array."""
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    elif not isinstance(array, pa.Array):
+        return pa.array([
+            value if value is None or isinstance(value, str) else str(value)
+            for value in array
+        ], type=pa.string())
+    if pa.types.is_string(array.type):
+        return array
+    if pa.types.is_null(array.type):
+        return array.cast(pa.string())
+    return pc.cast(array, pa.string())
+
+
+def to_number_strings(array: pa.Array, mask: pa.Array) -> pa.Array:
+    """Return the matched numbers strings (without the plus) for the cast."""
+    array = pc.replace_substring_regex(array, r"^\+", "")
+    return pc.if_else(mask, array, pa.scalar(None, pa.string()))
+
+
+def validate_rest(source: pa.Array, values: pa.Array, mask: pa.Array,
+                  validator, value_type: pa.DataType, check=None):
+    """
+    Return the values and the mask with the not matched values validated.
+
+    The values not matched by the kernel pattern are given to the scalar
+    validator one by one, the result failed the ``check`` is invalid.
+    """
+    rest = pc.fill_null(pc.invert(mask), False)
+    if not pc.any(rest).as_py():
+        return values, mask
+    values, mask = values.to_pylist(), mask.to_pylist()
+    for idx, (value, checked) in enumerate(
+            zip(source.to_pylist(), rest.to_pylist())):
+        if not checked:
+            continue
+        try:
+            values[idx] = validator(value)
+            mask[idx] = check is None or check(values[idx])
+        except ValidationError:
+            mask[idx] = False
+        if not mask[idx]:
+            values[idx] = None
+    return pa.array(values, type=value_type), pa.array(mask, type=pa.bool_())
+
+
+def validate_int(array: pa.Array):
+    """
+    Return the parsed integers and the valid mask of the column.
+
+    The values are the same as ``is_int`` returns, but the integers out of
+    the ``int64`` range are invalid.
+    """
+    source = array
+    array = pc.replace_substring_regex(array, NUMBER_SPACES_RE, "")
+    mask = pc.match_substring_regex(array, INT_RE)
+    numbers = to_number_strings(array, mask)
+    try:
+        values = pc.cast(numbers, pa.int64())
+    except pa.ArrowInvalid:
+        # The 19 digits numbers may overflow, such values are invalid
+        parsed = [None if value is None else int(value)
+                  for value in numbers.to_pylist()]
+        in_range = pa.array(
+            [None if value is None else INT64_MIN <= value <= INT64_MAX
+             for value in parsed],
+            type=pa.bool_()
+        )
+        mask = pc.and_kleene(mask, in_range)
+        values = pc.if_else(
+            in_range,
+            pc.cast(pc.if_else(in_range, numbers, "0"), pa.int64()),
+            pa.scalar(None, pa.int64())
+        )
+    return validate_rest(
+        source, values, mask, is_int, pa.int64(),
+        check=lambda value: INT64_MIN <= value <= INT64_MAX
+    )
+
+
+def validate_float(array: pa.Array):
+    """Return the floats parsed as by ``is_float`` and the valid mask."""
+    source = array
+    array = pc.replace_substring(
+        pc.replace_substring_regex(array, NUMBER_SPACES_RE, ""), ",", "."
+    )
+    mask = pc.match_substring_regex(array, FLOAT_RE)
+    values = pc.cast(to_number_strings(array, mask), pa.float64())
+    return validate_rest(source, values, mask, is_float, pa.float64())
+
+
+def validate_url(array: pa.Array):
+    """Return the URLs and the valid mask of the column."""
+    try:
+        mask = pc.match_substring_regex(array, URL_RE2_PATTERN)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # RE2 doesn't support the pattern, check the values one by one
+        mask = pa.array(
+            [None if value is None else bool(URL_RE.match(value))
+             for value in array.to_pylist()],
+            type=pa.bool_()
+        )
+    return pc.if_else(mask, array, pa.scalar(None, pa.string())), mask
+
+
+def validate_values(validator):
+    """Return the column validator calling given one for the each value."""
+    def validate(array: pa.Array):
+        values, mask = [], []
+        for value in array.to_pylist():
+            if value is None:
+                values.append(None)
+                mask.append(None)
+                continue
+            try:
+                values.append(validator(value))
+                mask.append(True)
+            except ValidationError:
+                values.append(None)
+                mask.append(False)
+        return pa.array(values), pa.array(mask, type=pa.bool_())
+
+    return validate
+
+
+class DatetimeParser:
+    """
+    The datetime values parser.
+
+    The format is inferred by the sample of the column values and is cached
+    by the column name, so the other values are parsed by the known format
+    first. The values without the column name are parsed independently.
+    The ISO-8601 values are parsed by ``datetime.fromisoformat`` and by the
+    Arrow cast, the other formats by the Arrow ``strptime`` kernel and by
+    ``datetime.strptime`` for the rest.
+    """
+
+    sample_size = 100
+
+    def __init__(self, formats: tuple = DATETIME_FORMATS, unit: str = "us"):
+        self.formats = formats
+        self.unit = unit
+        self._formats = {}
+
+    def infer_format(self, values: list):
+        """Return the format matching the most of given values."""
+        best_format, best_count = None, 0
+        for datetime_format in self.formats:
+            count = 0
+            for value in values:
+                try:
+                    datetime.strptime(value, datetime_format)
+                    count += 1
+                except ValueError:
+                    pass
+            if count > best_count:
+                best_format, best_count = datetime_format, count
+                if count == len(values):
+                    break
+        return best_format
+
+    def get_format(self, array: pa.Array, column: str = None):
+        """Return the cached or the inferred format of the column."""
+        if column is not None and column in self._formats:
+            return self._formats[column]
+        sample = pc.filter(array, pc.is_valid(array))
+        datetime_format = self.infer_format(
+            sample.slice(0, self.sample_size).to_pylist()
+        )
+        if datetime_format is not None and column is not None:
+            self._formats[column] = datetime_format
+        return datetime_format
+
+    def parse_value(
+        self,
+        value: str,
+        column: str = None,
+        datetime_format: str = None
+    ) -> datetime:
+        """
+        Return the datetime of the value or raise ``ValidationError``.
+
+        The ``datetime_format`` or the cached format of the column is tried
+        first.
+        """
+        if isinstance(value, datetime):
+            return value
+        if not isinstance(value, str):
+            raise ValidationError
+        datetime_format = datetime_format or self._formats.get(column)
+        if datetime_format is not None:
+            try:
+                return datetime.strptime(value, datetime_format)
+            except ValueError:
+                pass
         try:
-            return datetime.strptime(value, datetime_format)
+            return datetime.fromisoformat(value)
         except ValueError:
             pass
-    raise ValidationError
+        for datetime_format in self.formats:
+            try:
+                result = datetime.strptime(value, datetime_format)
+            except ValueError:
+                continue
+            if column is not None:
+                self._formats[column] = datetime_format
+            return result
+        raise ValidationError
+
+    def parse_array(self, array, column: str = None):
+        """
+        Return the Arrow timestamps and the valid mask of the column.
+
+        The whole array is parsed by the Arrow kernels when all the values
+        have the inferred format, otherwise the values are parsed one by one.
+        """
+        array = to_string_array(array)
+        datetime_format = self.get_format(array, column)
+        values = None
+        try:
+            if datetime_format in ISO_FORMATS:
+                values = pc.cast(array, pa.timestamp(self.unit))
+            elif datetime_format and "%f" not in datetime_format:
+                values = pc.strptime(
+                    array, format=datetime_format, unit=self.unit
+                )
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            values = None
+        if values is not None:
+            mask = pc.if_else(
+                pc.is_valid(array),
+                pa.scalar(True),
+                pa.scalar(None, pa.bool_())
+            )
+            return values, mask
+
+        values, mask = [], []
+        for value in array.to_pylist():
+            if value is None:
+                values.append(None)
+                mask.append(None)
+                continue
+            try:
+                values.append(
+                    self.parse_value(value, column, datetime_format)
+                )
+                mask.append(True)
+            except ValidationError:
+                values.append(None)
+                mask.append(False)
+        return (
+            pa.array(values, type=pa.timestamp(self.unit)),
+            pa.array(mask, type=pa.bool_())
+        )
+
+
+DATETIME_PARSER = DatetimeParser()
+
+# The factories of the column validators by the column name, the validator
+# is the function of the array returning the values and the valid mask.
+COLUMN_VALIDATORS = {
+    "int": lambda column: validate_int,
+    "float": lambda column: validate_float,
+    "url": lambda column: validate_url,
+    # The parser keeps the inferred format of the column
+    "datetime": lambda column: functools.partial(
+        DatetimeParser().parse_array, column=column
+    ),
+}
+
+
+class ColumnReport:
+    """The validation result of the column."""
+
+    def __init__(self, name: str, source: pa.Array, values: pa.Array,
+                 mask: pa.Array):
+        self.name = name
+        self.source = source
+        self.values = values
+        # The nulls are valid, them are checked by the schema
+        self.mask = pc.fill_null(mask, True)
+
+    @property
+    def errors(self) -> int:
+        """Return the number of the invalid values."""
+        return pc.sum(pc.invert(self.mask).cast(pa.int64())).as_py() or 0
+
+    @property
+    def is_valid(self) -> bool:
+        return self.errors == 0
+
+    def get_samples(self, limit: int = 10) -> list:
+        """Return the first invalid values."""
+        invalid = pc.filter(self.source, pc.invert(self.mask))
+        return invalid.slice(0, limit).to_pylist()
+
+    def to_dict(self, limit: int = 10) -> dict:
+        return {
+            "column": self.name,
+            "rows": len(self.mask),
+            "errors": self.errors,
+            "samples": self.get_samples(limit),
+        }
+
+
+class ColumnValidator:
+    """
+    The columns validator.
+
+    The rules are the mapping of the column names to the validators names
+    (see ``COLUMN_VALIDATORS``) or the functions of the value raising
+    ``ValidationError``. The rules are compiled once and are applied
+    to the whole columns, the errors are reported but don't raise.
+    """
+
+    def __init__(self, rules: dict):
+        self.rules = {
+            name: self.compile(rule, name) for name, rule in rules.items()
+        }
+
+    @staticmethod
+    def compile(rule, column: str = None):
+        if callable(rule):
+            return validate_values(rule)
+        try:
+            factory = COLUMN_VALIDATORS[rule]
+        except KeyError:
+            raise ValueError(f"Unknown validator `{rule}`")
+        return factory(column)
+
+    @staticmethod
+    def to_columns(data) -> dict:
+        """Return the columns of the Arrow table, columns dict or rows list."""
+        if isinstance(data, (pa.Table, pa.RecordBatch)):
+            return {
+                name: data.column(name) for name in data.schema.names
+            }
+        if isinstance(data, dict):
+            return data
+        rows = list(data)
+        names = {name: None for row in rows for name in row}
+        return {name: [row.get(name) for row in rows] for name in names}
+
+    def validate(self, data) -> dict:
+        """Return the reports of the validated columns."""
+        columns = self.to_columns(data)
+        num_rows = len(next(iter(columns.values()))) if columns else 0
+        reports = {}
+        for name, validate in self.rules.items():
+            if name in columns:
+                source = to_string_array(columns[name])
+            else:
+                source = pa.nulls(num_rows, pa.string())
+            values, mask = validate(source)
+            reports[name] = ColumnReport(name, source, values, mask)
+        return reports
@@ -0,0 +1,80 @@
+"""The files data resource tests."""
+
+import io
+import gzip
+import json
+
+import pytest
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from nvk_ds.fs import FSResource, iter_json_array
+
+
+DOCUMENT = [
+    11, 2.5, -0.125, 1e5, 2.5E-3, 3,
+    "text", "escaped \" quote", "кириллица", "emoji \U0001F600",
+    {"a": [1, 2], "b": "ü"}, [], {}, True, False, None,
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 1024])
+def test_iter_json_array(chunk_size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+    assert list(iter_json_array(io.BytesIO(data), chunk_size)) == DOCUMENT
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"[11, 2.5, 3]", [11, 2.5, 3]),
+    (b"[11, 1e5, 3]", [11, 1e5, 3]),
+    (b"[11, 1e+5, 3]", [11, 1e5, 3]),
+    (b"[123456789]", [123456789]),
+    (b" [ 1 ,\n2 ] ", [1, 2]),
+])
+@pytest.mark.parametrize("chunk_size", range(1, 9))
+def test_iter_json_array_numbers(data, expected, chunk_size):
+    assert list(iter_json_array(io.BytesIO(data), chunk_size)) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7])
+def test_iter_json_array_gzip(chunk_size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+    with gzip.GzipFile(fileobj=io.BytesIO(gzip.compress(data))) as fh:
+        assert list(iter_json_array(fh, chunk_size)) == DOCUMENT
+
+
+def test_iter_json_array_not_array():
+    assert list(iter_json_array(io.BytesIO(b'{"a": 1}'))) == []
+
+
+def test_iter_json_array_invalid():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.BytesIO(b"[1, 2.5.3]"), 2))
+
+
+@pytest.mark.parametrize("params", [
+    dict(filter=[("a", ">", 1)]),
+    dict(columns=["a"]),
+])
+def test_incremental_filtered(tmp_path, params):
+    pq.write_table(
+        pa.table({"a": [1, 2, 3], "b": ["x", "y", "z"]}),
+        tmp_path / "data.parquet"
+    )
+    ds = FSResource(str(tmp_path), incremental=True)
+    # The partly read file would never be marked read
+    with pytest.raises(ValueError):
+        ds.build_query(format="parquet", **params).execute()
+    ds.commit()
+
+    q = ds.build_query(format="parquet").execute()
+    assert list(q) == [
+        {"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"a": 3, "b": "z"}
+    ]
+    ds.commit()
+    assert list(ds.build_query(format="parquet").execute()) == []
+
+    # The not incremental resource scans the files partly
+    ds = FSResource(str(tmp_path))
+    q = ds.build_query(format="parquet", **params).execute()
+    assert len(list(q)) == (2 if "filter" in params else 3)
@@ -0,0 +1,190 @@
+"""The GBQ chunked loading tests."""
+
+import io
+import json
+import threading
+
+import pyarrow.parquet as pq
+import pytest
+from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
+from google.api_core.exceptions import BadRequest
+
+from nvk_ds.gbq import GBQResource
+
+
+def table_key(table) -> str:
+    if isinstance(table, bigquery.Table):
+        table = table.reference
+    if isinstance(table, bigquery.TableReference):
+        return "{0}.{1}.{2}".format(
+            table.project, table.dataset_id, table.table_id
+        )
+    return table
+
+
+class FakeJob:
+
+    def __init__(self, output_rows=0, error=None):
+        self.output_rows = output_rows
+        self.error = error
+
+    def result(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return self
+
+
+class FakeClient:
+    """The client keeping the tables rows in memory."""
+
+    project = "project"
+
+    def __init__(self, tables=None):
+        self.lock = threading.Lock()
+        self.tables = {}
+        self.rows = {}
+        self.loads = []
+        self.copies = []
+        for name, rows in (tables or {}).items():
+            table = bigquery.Table(name)
+            table.time_partitioning = bigquery.TimePartitioning(field="day")
+            table.clustering_fields = ["id"]
+            self.tables[name] = table
+            self.rows[name] = list(rows)
+
+    def get_table(self, table):
+        key = table_key(table)
+        if key not in self.tables:
+            raise NotFound(key)
+        return self.tables[key]
+
+    def create_table(self, table):
+        self.tables[table_key(table)] = table
+        self.rows[table_key(table)] = []
+        return table
+
+    def update_table(self, table, fields):
+        self.tables[table_key(table)] = table
+        return table
+
+    def delete_table(self, table, not_found_ok=False):
+        self.tables.pop(table_key(table), None)
+        self.rows.pop(table_key(table), None)
+
+    def load_table_from_file(self, stream, destination, job_config=None):
+        data = stream.read()
+        if job_config.source_format == bigquery.SourceFormat.PARQUET:
+            rows = pq.read_table(io.BytesIO(data)).to_pylist()
+        else:
+            rows = [json.loads(line) for line in data.splitlines()]
+        key = table_key(destination)
+        with self.lock:
+            self.loads.append((key, len(rows)))
+            if any(row.get("fail") for row in rows):
+                return FakeJob(error=BadRequest("the chunk failed"))
+            if key not in self.tables and rows:
+                self.create_table(bigquery.Table(key))
+            self.rows.setdefault(key, []).extend(rows)
+        return FakeJob(len(rows))
+
+    def copy_table(self, source, destination, job_config=None):
+        key = table_key(destination)
+        self.copies.append((table_key(source), key,
+                            job_config.write_disposition))
+        if key not in self.tables:
+            self.tables[key] = bigquery.Table(key)
+        if job_config.write_disposition == "WRITE_TRUNCATE":
+            self.rows[key] = []
+        self.rows.setdefault(key, []).extend(self.rows[table_key(source)])
+        return FakeJob()
+
+
+TARGET = "project.dataset.target"
+
+
+def make_rows(count, start=0):
+    return [{"id": idx, "name": "row {0}".format(idx)}
+            for idx in range(start, start + count)]
+
+
+def bulk_insert(client, mappings, **kwargs):
+    ds = GBQResource({}, client=client)
+    return ds.bulk_insert(TARGET, mappings, chunk_size=100, **kwargs)
+
+
+@pytest.mark.parametrize("truncate", [False, True])
+def test_chunked_load(truncate):
+    client = FakeClient({TARGET: make_rows(2, 100)})
+    created = []
+    create_table = client.create_table
+    client.create_table = lambda table: created.append(table) \
+        or create_table(table)
+
+    assert bulk_insert(client, make_rows(20), truncate=truncate) == 20
+    # The rows are loaded by several chunks into the staging table
+    assert len(client.loads) > 1
+    assert all(key != TARGET for key, _ in client.loads)
+    assert client.copies == [(
+        client.loads[0][0], TARGET,
+        "WRITE_TRUNCATE" if truncate else "WRITE_APPEND"
+    )]
+    # The staging table keeps the target spec and expires
+    staging, = created
+    assert staging.time_partitioning.field == "day"
+    assert staging.clustering_fields == ["id"]
+    assert staging.expires is not None
+    assert list(client.tables) == [TARGET]
+    expected = make_rows(20) if truncate \
+        else make_rows(2, 100) + make_rows(20)
+    assert sorted(client.rows[TARGET], key=lambda row: row["id"]) \
+        == sorted(expected, key=lambda row: row["id"])
+
+
+@pytest.mark.parametrize("truncate", [False, True])
+def test_chunked_load_failed(truncate):
+    client = FakeClient({TARGET: make_rows(2, 100)})
+    rows = make_rows(20)
+    rows[15]["fail"] = True
+    with pytest.raises(BadRequest):
+        bulk_insert(client, rows, truncate=truncate, max_workers=1)
+    # The target is intact and the staging table is dropped
+    assert client.copies == []
+    assert client.rows[TARGET] == make_rows(2, 100)
+    assert list(client.tables) == [TARGET]
+
+
+def test_chunked_load_empty_truncate():
+    client = FakeClient({TARGET: make_rows(2, 100)})
+    assert bulk_insert(client, [], truncate=True) == 0
+    assert client.rows[TARGET] == []
+    assert list(client.tables) == [TARGET]
+
+
+def test_chunked_load_missing_table():
+    client = FakeClient()
+    assert bulk_insert(client, make_rows(20)) == 20
+    assert sorted(client.rows[TARGET], key=lambda row: row["id"]) \
+        == make_rows(20)
+    assert list(client.tables) == [TARGET]
+    assert client.tables[TARGET].expires is None
+
+
+def test_chunked_load_missing_table_empty():
+    client = FakeClient()
+    assert bulk_insert(client, []) == 0
+    assert client.tables == {}
+
+
+def test_chunked_load_parquet_rows():
+    client = FakeClient({TARGET: []})
+    ds = GBQResource({}, client=client, chunk_rows=4)
+    assert ds.bulk_insert(
+        TARGET,
+        make_rows(10),
+        source_format=bigquery.SourceFormat.PARQUET,
+        parquet_schema=[("id", "int64"), ("name", "string")],
+        chunk_size=1
+    ) == 10
+    # The parquet chunks are cut by the rows count
+    assert sorted(rows for _, rows in client.loads) == [2, 4, 4]
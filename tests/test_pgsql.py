@@ -0,0 +1,386 @@
+"""The PostgreSQL partitioned reading helpers tests."""
+
+import queue
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from nvk_ds import pgsql
+
+
+def test_split_range_int():
+    assert pgsql.split_range(0, 10, 4) == [2, 5, 7]
+
+
+def test_split_range_float():
+    assert pgsql.split_range(0.0, 1.0, 4) == [0.25, 0.5, 0.75]
+
+
+def test_split_range_decimal():
+    assert pgsql.split_range(Decimal("0"), Decimal("1"), 2) == [Decimal("0.5")]
+
+
+def test_split_range_datetime():
+    assert pgsql.split_range(
+        datetime(2022, 1, 1), datetime(2022, 1, 3), 2
+    ) == [datetime(2022, 1, 2)]
+
+
+def test_split_range_narrow():
+    assert pgsql.split_range(0, 2, 4) == [1]
+
+
+def test_split_range_empty():
+    assert pgsql.split_range(None, None, 4) == []
+
+
+def test_put_until():
+    out = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    assert pgsql.put_until(out, 1, stop)
+    timer = threading.Timer(0.2, stop.set)
+    timer.start()
+    # The full queue is waited for until the stop
+    assert not pgsql.put_until(out, 2, stop)
+    assert out.get_nowait() == 1
+
+
+def test_drain_queue():
+    out = queue.Queue()
+    for item in (1, None, 2, None):
+        out.put(item)
+    assert list(pgsql.drain_queue(out, 2)) == [1, 2]
+
+
+def test_drain_queue_exception():
+    out = queue.Queue()
+    out.put(1)
+    out.put(ValueError("partition failed"))
+    items = pgsql.drain_queue(out, 1)
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+def make_query(ordered: bool, produce):
+    q = pgsql.PgSQLQuery()
+    q._partition_bounds = [10, 20]
+    q._x__ordered = ordered
+    q.fetch_partition = produce
+    return q
+
+
+def test_iter_partitions_ordered():
+    sizes = []
+
+    def produce(idx, out, stop, opened):
+        sizes.append(out.maxsize)
+        for batch in range(5):
+            if not pgsql.put_until(out, (idx, batch), stop):
+                return
+        pgsql.put_until(out, None, stop)
+
+    q = make_query(True, produce)
+    assert list(q.iter_partitions()) == [
+        (idx, batch) for idx in range(3) for batch in range(5)
+    ]
+    # The following partitions are not buffered as a whole
+    assert all(0 < size < 5 for size in sizes)
+
+
+def test_iter_partitions_unordered():
+    def produce(idx, out, stop, opened):
+        for batch in range(5):
+            pgsql.put_until(out, (idx, batch), stop)
+        pgsql.put_until(out, None, stop)
+
+    q = make_query(False, produce)
+    assert sorted(q.iter_partitions()) == [
+        (idx, batch) for idx in range(3) for batch in range(5)
+    ]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_partitions_early_stop(ordered):
+    stopped = []
+
+    def produce(idx, out, stop, opened):
+        # The endless partition is stopped by the consumer
+        while pgsql.put_until(out, idx, stop):
+            pass
+        stopped.append(idx)
+
+    q = make_query(ordered, produce)
+    batches = q.iter_partitions()
+    next(batches)
+    batches.close()
+    assert sorted(stopped) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_partitions_exception(ordered):
+    def produce(idx, out, stop, opened):
+        if idx == 1:
+            pgsql.put_until(out, RuntimeError("partition failed"), stop)
+            return
+        while pgsql.put_until(out, idx, stop):
+            if idx == 0 and ordered:
+                break
+        if idx == 0 and ordered:
+            pgsql.put_until(out, None, stop)
+
+    q = make_query(ordered, produce)
+    with pytest.raises(RuntimeError):
+        list(q.iter_partitions())
+
+
+class FakePool:
+
+    def __init__(self, maxconn):
+        self.maxconn = maxconn
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.lock = threading.Lock()
+        self.used = 0
+        self.max_used = 0
+
+
+class FakeResource:
+    """The pooled resource taking the connections without the timeout."""
+
+    pooled = True
+
+    def __init__(self, pool, wait=False):
+        self.pool = pool
+        self.wait = wait
+        self.opened = False
+
+    def get_pool(self):
+        return self.pool
+
+    def clone(self, pool_wait=False):
+        return FakeResource(self.pool, pool_wait)
+
+    def open(self):
+        assert self.wait
+        self.pool.slots.acquire()
+        with self.pool.lock:
+            self.pool.used += 1
+            self.pool.max_used = max(self.pool.max_used, self.pool.used)
+        self.opened = True
+
+    def rollback(self):
+        with self.pool.lock:
+            self.pool.used -= 1
+        self.pool.slots.release()
+        self.opened = False
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_iter_partitions_pool(ordered):
+    pool = FakePool(3)
+    main = FakeResource(pool)
+    main.opened = True
+    pool.slots.acquire()
+
+    q = pgsql.PgSQLQuery()
+    q._x__ds = main
+    q._partition_bounds = list(range(7))
+    q._x__ordered = ordered
+    q.read_partition = lambda ds, idx: iter([[idx]] * 5)
+
+    result = list(q.iter_partitions())
+    assert sorted(result) == sorted([[idx] for idx in range(8)] * 5)
+    if ordered:
+        assert result == [[idx] for idx in range(8) for _ in range(5)]
+    # The partitions wait for the pool slots but the main thread one
+    assert pool.max_used == 2
+    assert pool.used == 0
+
+
+def test_build_subquery_sql():
+    q = pgsql.PgSQLQuery()
+    q._x__query = "SELECT * FROM t WHERE a = ';' ;\n;\n"
+    assert q.build_subquery_sql() == "SELECT * FROM t WHERE a = ';'"
+
+
+class FakeCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query):
+        assert query == 'SELECT txid_current_if_assigned()'
+
+    def fetchone(self):
+        return (self.conn.txid,)
+
+
+class FakeConnection:
+
+    def __init__(self, status, txid=None):
+        self.info = type('Info', (), {'transaction_status': status})()
+        self.txid = txid
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class FakeConnectionPool:
+
+    def __init__(self):
+        self.returned = []
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+
+def make_pooled_resource(conn):
+    ds = pgsql.PgSQLResource("dbname=test", pooled=True)
+    pool = FakeConnectionPool()
+    ds.get_pool = lambda: pool
+    ds._resource = conn
+    return ds, pool
+
+
+@pytest.mark.parametrize("status", [
+    pgsql.psycopg2.extensions.TRANSACTION_STATUS_IDLE,
+    pgsql.psycopg2.extensions.TRANSACTION_STATUS_INTRANS,
+    pgsql.psycopg2.extensions.TRANSACTION_STATUS_INERROR,
+])
+def test_release_idle(status):
+    conn = FakeConnection(status)
+    ds, pool = make_pooled_resource(conn)
+    ds.release_idle()
+    assert pool.returned == [conn]
+    assert conn.rolled_back
+    assert not ds.opened
+
+
+def test_release_idle_written():
+    conn = FakeConnection(
+        pgsql.psycopg2.extensions.TRANSACTION_STATUS_INTRANS, txid=42
+    )
+    ds, pool = make_pooled_resource(conn)
+    ds.release_idle()
+    # The written transaction waits for the commit
+    assert pool.returned == []
+    assert ds._resource is conn
+
+
+def test_close_other_thread_connection():
+    conn = FakeConnection(pgsql.psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+    ds, pool = make_pooled_resource(conn)
+    thread = threading.Thread(target=ds.close)
+    thread.start()
+    thread.join()
+    # The connection in use by this thread is not returned by the other one
+    assert pool.returned == []
+    assert ds._resource is conn
+    ds.close()
+    assert pool.returned == [conn]
+
+
+class PoolCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query):
+        if self.conn.broken:
+            raise pgsql.psycopg2.OperationalError("connection lost")
+        self.conn.executed.append(query)
+
+
+class PoolConnection:
+
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.closed = False
+        self.executed = []
+        self.commits = 0
+        self.info = type('Info', (), {
+            'transaction_status':
+                pgsql.psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        })()
+
+    def cursor(self):
+        return PoolCursor(self)
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(maxconn, connections):
+    pool = pgsql.PgSQLConnectionPool(0, maxconn, "dbname=test")
+    connections = iter(connections)
+
+    def connect(key=None):
+        conn = next(connections)
+        key = pool._getkey() if key is None else key
+        pool._used[key] = conn
+        pool._rused[id(conn)] = key
+        return conn
+
+    pool._connect = connect
+    return pool
+
+
+def test_pool_reset_session():
+    conn = PoolConnection()
+    pool = make_pool(2, [conn])
+    assert pool.getconn() is conn
+    pool.putconn(conn)
+    assert conn.executed == [pgsql.PgSQLConnectionPool.reset_sql]
+    assert "DISCARD ALL" not in pgsql.PgSQLConnectionPool.reset_sql
+    # The reset is committed, the connection is reused
+    assert conn.commits == 1
+    assert not conn.closed
+    assert pool.getconn() is conn
+
+
+def test_pool_reset_failed():
+    broken, conn = PoolConnection(broken=True), PoolConnection()
+    pool = make_pool(2, [broken, conn])
+    assert pool.getconn() is broken
+    pool.putconn(broken)
+    assert broken.closed
+    assert pool.getconn() is conn
+
+
+def test_pool_keeps_maxconn_idle():
+    conns = [PoolConnection() for _ in range(3)]
+    pool = make_pool(3, conns)
+    taken = [pool.getconn() for _ in range(3)]
+    for conn in taken:
+        pool.putconn(conn)
+    # Up to ``maxconn`` connections are kept, ``minconn`` is untouched
+    assert pool.minconn == 0
+    assert not any(conn.closed for conn in conns)
+    assert sorted(map(id, pool._pool)) == sorted(map(id, conns))
@@ -0,0 +1,153 @@
+"""The REST-API resource tests."""
+
+import json
+import threading
+
+import pytest
+import requests
+
+from nvk_ds import restapi
+from nvk_ds.restapi import RestAPIResource, TokenBucket
+
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, data=None, headers=None, url=""):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.reason = "Fake"
+        self.url = url
+        self.headers = headers or {}
+        self.content = json.dumps(data).encode("utf-8") \
+            if data is not None else b""
+
+
+class FakeSession:
+    """The session answering the requests by the ``respond`` function."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def request(self, http_method, url, **q_attrs):
+        with self.lock:
+            self.requests.append((http_method, url, q_attrs))
+        return self.respond(http_method, url, **q_attrs)
+
+
+def make_resource(respond, **kwargs):
+    ds = RestAPIResource({"api_url": "https://api.test/"}, **kwargs)
+    ds._resource = FakeSession(respond)
+    return ds
+
+
+def capped_pages(total, cap):
+    """Return the API answering up to ``cap`` items whatever is asked."""
+    def respond(http_method, url, params=None, **q_attrs):
+        size = min(params["per_page"], cap)
+        start = (params["page"] - 1) * size
+        return FakeResponse(data=list(range(start, min(start + size, total))))
+    return respond
+
+
+@pytest.mark.parametrize("total", [0, 30, 100, 250])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_paging_capped_page_size(total, workers):
+    ds = make_resource(capped_pages(total, 100))
+    q = ds.build_query(
+        url="items", paging="page", pagesize=500, workers=workers
+    ).execute()
+    assert [item for page in q for item in page] == list(range(total))
+
+
+def test_paging_limit():
+    ds = make_resource(capped_pages(1000, 100))
+    q = ds.build_query(
+        url="items", paging="page", pagesize=100, workers=3, limit=2
+    ).execute()
+    assert [item for page in q for item in page] == list(range(200))
+
+
+def test_token_bucket_capacity():
+    with pytest.raises(ValueError):
+        TokenBucket(10, 0.5)
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+    bucket = TokenBucket(10, 2)
+    with pytest.raises(ValueError):
+        bucket.acquire(3)
+    bucket.acquire(2)
+
+
+def test_rate_burst_below_one_token():
+    with pytest.raises(ValueError):
+        RestAPIResource({}, rate_limit=5, rate_burst=0.5)
+
+
+def answers(*responses):
+    """Return the API answering the responses one by one."""
+    responses = iter(responses)
+
+    def respond(http_method, url, **q_attrs):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    return respond
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(restapi.time, "sleep", delays.append)
+    return delays
+
+
+def test_retry_statuses(sleeps):
+    ds = make_resource(answers(
+        FakeResponse(503),
+        requests.ConnectionError("reset"),
+        FakeResponse(data=[1]),
+    ))
+    # The queries retry the idempotent requests three times by default
+    assert list(ds.build_query(url="items").execute()) == [[1]]
+    assert len(ds._resource.requests) == 3
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= 1 for delay in sleeps)
+
+
+def test_retry_attempts_exhausted(sleeps):
+    ds = make_resource(answers(*[FakeResponse(500)] * 3))
+    with pytest.raises(restapi.RequestError):
+        ds.build_query(url="items").execute()
+    assert len(ds._resource.requests) == 3
+
+
+def test_retry_not_idempotent(sleeps):
+    ds = make_resource(answers(FakeResponse(503), FakeResponse(data=[1])))
+    with pytest.raises(restapi.RequestError):
+        ds.build_query(url="items", http_method="post").execute()
+    assert len(ds._resource.requests) == 1
+    assert sleeps == []
+
+
+def test_retry_after(sleeps):
+    ds = make_resource(answers(
+        FakeResponse(429, headers={"Retry-After": "2"}),
+        FakeResponse(data=[1]),
+    ))
+    assert list(ds.build_query(url="items").execute()) == [[1]]
+    # The mocked sleep does not pass the throttled time, it is held again
+    assert sleeps[0] == 2 and max(sleeps) == 2
+
+
+def test_retry_after_clamped(sleeps):
+    ds = make_resource(answers(
+        FakeResponse(503, headers={"Retry-After": "86400"}),
+        FakeResponse(data=[1]),
+    ), backoff_max=5)
+    assert list(ds.build_query(url="items").execute()) == [[1]]
+    assert sleeps[0] == 5 and max(sleeps) == 5
+    # The other requests are held for the clamped delay only
+    assert ds._resume_at - restapi.time.monotonic() <= 5
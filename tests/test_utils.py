@@ -0,0 +1,50 @@
+"""The utilities tests."""
+
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+from nvk_ds.utils import to_copy_value, to_stream_pgcopy
+
+
+def test_copy_value_null():
+    assert to_copy_value(None) == "\\N"
+
+
+def test_copy_value_scalars():
+    assert to_copy_value(True) == "t"
+    assert to_copy_value(False) == "f"
+    assert to_copy_value(12) == "12"
+    assert to_copy_value(1.5) == "1.5"
+    assert to_copy_value(Decimal("1.50")) == "1.50"
+
+
+def test_copy_value_datetime():
+    assert to_copy_value(datetime(2022, 1, 2, 3, 4, 5, 600000)) \
+        == "2022-01-02T03:04:05.600000"
+    assert to_copy_value(
+        datetime(2022, 1, 2, 10, tzinfo=timezone(timedelta(hours=3)))
+    ) == "2022-01-02T10:00:00+03:00"
+    assert to_copy_value(date(2022, 1, 2)) == "2022-01-02"
+    assert to_copy_value(time(3, 4, 5, 600000)) == "03:04:05.600000"
+
+
+def test_copy_value_bytes():
+    assert to_copy_value(b"ab") == "\\\\x6162"
+    assert to_copy_value(memoryview(b"\x00")) == "\\\\x00"
+
+
+def test_copy_value_escapes():
+    assert to_copy_value("a\tb\nc\rd\\e") == "a\\tb\\nc\\rd\\\\e"
+    assert to_copy_value("\\N") == "\\\\N"
+
+
+def test_copy_value_json():
+    assert to_copy_value({"a": "x\ty"}) == '{"a": "x\\\\ty"}'
+
+
+def test_stream_pgcopy():
+    stream = to_stream_pgcopy(
+        [{"a": 1, "b": "x\ny"}, {"a": None}],
+        ["a", "b"]
+    )
+    assert stream.read() == "1\tx\\ny\n\\N\t\\N\n"
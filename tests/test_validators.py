@@ -0,0 +1,81 @@
+"""The validators tests."""
+
+import pyarrow as pa
+import pytest
+
+from nvk_ds.validators import (
+    INT64_MIN, INT64_MAX, ValidationError, is_int, is_float,
+    validate_int, validate_float
+)
+
+
+VALUES = [
+    "0", "42", "-42", "+42", "007", "1 000", "1\u00a0000", "1\u202f000",
+    "1\u2009000", "1\u2007000", "1\v000", "12\u3000345", " 7 ",
+    "9223372036854775807", "-9223372036854775808", "9223372036854775808",
+    "99999999999999999999", "1_000", "1__000", "١٢٣",
+    "1.5", "-.5", "1.", "1,5", "1e5", "2.5E-3", "1_000.5", "1e", ".", "",
+    " ", "nan", "NaN", "inf", "-Infinity", "0x10", "abc", "1 0", None,
+]
+
+
+def scalar_result(validator, value):
+    if value is None:
+        return None, None
+    try:
+        return validator(value), True
+    except ValidationError:
+        return None, False
+
+
+@pytest.mark.parametrize("validator, validate", [
+    (is_int, validate_int),
+    (is_float, validate_float),
+])
+def test_scalar_and_column_agree(validator, validate):
+    values, mask = validate(pa.array(VALUES, type=pa.string()))
+    column = list(zip(values.to_pylist(), mask.to_pylist()))
+    scalar = []
+    for value in VALUES:
+        result, valid = scalar_result(validator, value)
+        if validator is is_int and valid \
+                and not INT64_MIN <= result <= INT64_MAX:
+            # The column holds the ``int64`` integers only
+            result, valid = None, False
+        scalar.append((result, valid))
+    # The ``repr`` makes ``nan`` equal to itself
+    assert repr(column) == repr(scalar)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1\u2009000", 1000),
+    ("1\u2007000", 1000),
+    ("1\v000", 1000),
+    ("12\u3000345", 12345),
+    ("1_000", 1000),
+    ("١٢٣", 123),
+    ("99999999999999999999", 99999999999999999999),
+])
+def test_is_int(value, expected):
+    assert is_int(value) == expected
+
+
+@pytest.mark.parametrize("value", ["1.5", "0x10", "1__000", "", None])
+def test_is_int_invalid(value):
+    with pytest.raises(ValidationError):
+        is_int(value)
+
+
+def test_is_float():
+    assert is_float("1\u2009000,5") == 1000.5
+    assert is_float("1_000.5") == 1000.5
+    assert is_float("-inf") == float("-inf")
+    assert is_float("nan") != is_float("nan")
+
+
+def test_validate_int_out_of_range():
+    values, mask = validate_int(
+        pa.array(["99999999999999999999", "1"], type=pa.string())
+    )
+    assert values.to_pylist() == [None, 1]
+    assert mask.to_pylist() == [False, True]